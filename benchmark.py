@@ -0,0 +1,446 @@
+import gc
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter, deque
+
+# 性能基准: 在虚拟显示驱动上无界面运行各游戏的压力场景, 统计每帧各阶段耗时、
+# 帧时间的 p50/p99、内存分配和垃圾回收次数, 可以保存为基线供之后对比。
+# 场景直接驱动游戏自己的 update/tick、handle_collisions 和 draw, 只在帧与帧之间
+# (不计时) 补足敌人、子弹等数量, 让压力保持在设定的水平。
+#
+#   python benchmark.py [场景...] [--frames N] [--save 文件] [--compare 文件]
+#
+# --startup 改为测量冷启动: 每次在新的解释器中导入游戏模块, 统计进程总耗时、模块导入耗时,
+# 并检查导入后是否已经初始化了子系统或打开了窗口 (导入应当没有副作用)。
+#
+#   python benchmark.py --startup [游戏...] [--save 文件] [--compare 文件]
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from mario_level import generate_level
+from render_cache import get_font
+from replay import GAMES, ROOT, load_game
+from window import open_window
+
+FRAMES = 300
+WARMUP_FRAMES = 30  # 预热帧不计入统计 (填充贴图缓存等)
+ALLOC_FRAMES = 100  # 开启 tracemalloc 单独测量分配的帧数
+STARTUP_RUNS = 5
+BASELINE_PATH = os.path.join(ROOT, "benchmark_baseline.json")
+
+PHASES = ("input", "update", "collisions", "draw")
+PHASE_NAMES = {"input": "输入", "update": "更新", "collisions": "碰撞", "draw": "绘制"}
+
+SHOOTER_WAVE = 20
+SHOOTER_ENEMIES = 300
+SHOOTER_BULLETS = 1000
+MARIO_CHUNKS = 1250  # 每个区块 4 个平台, 共 5000 个
+SNAKE_FILL = 0.9
+TETRIS_STACK_ROWS = 14
+
+
+# 分阶段计时: 顶层阶段用 run 调用, 嵌套在其中的函数 (例如 update 里的 handle_collisions)
+# 用 wrap 替换成计时版本; 嵌套阶段的时间从外层阶段中扣除, 各阶段之和等于整帧时间
+class PhaseTimer:
+    def __init__(self):
+        self.frame = dict.fromkeys(PHASES, 0.0)
+        self.stack = []
+        self.patched = []
+
+    def start_frame(self):
+        for phase in self.frame:
+            self.frame[phase] = 0.0
+
+    def run(self, phase, func, *args):
+        stack = self.stack
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            self.frame[phase] += elapsed - nested
+            if stack:
+                stack[-1] += elapsed
+
+    def wrap(self, owner, name, phase):
+        # owner 可以是对象也可以是类, restore 时恢复原来的属性
+        original = owner.__dict__.get(name) if isinstance(owner, type) else None
+        func = getattr(owner, name)
+
+        def timed(*args):
+            return self.run(phase, func, *args)
+
+        self.patched.append((owner, name, original))
+        setattr(owner, name, timed)
+
+    def restore(self):
+        for owner, name, original in reversed(self.patched):
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self.patched = []
+
+
+# 场景接口: prepare() 在每帧之前 (不计时) 把压力恢复到设定水平, frame() 用计时器跑一帧
+
+class ShooterScenario:
+    name = "shooter"
+    description = f"第 {SHOOTER_WAVE} 波, {SHOOTER_ENEMIES} 个敌人, {SHOOTER_BULLETS} 发子弹"
+
+    def __init__(self, timer):
+        self.timer = timer
+        module = self.module = load_game("shooter")
+        rng = self.rng = random.Random(0)
+        actions = [module.Action(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)),
+                                 rng.randrange(module.SCREEN_WIDTH),
+                                 rng.randrange(module.SCREEN_HEIGHT), True)
+                   for _ in range(120)]
+        game = self.game = module.Game(input_source=module.ScriptedInput(actions), seed=0)
+        game.wave = SHOOTER_WAVE
+        game.enemy_spawn_delay = max(1000, game.enemy_spawn_delay - 200 * (SHOOTER_WAVE - 1))
+        timer.wrap(game, "handle_collisions", "collisions")
+
+    def prepare(self):
+        game = self.game
+        module = self.module
+        rng = self.rng
+        # 玩家不会死亡, 被击杀的敌人和出界的子弹随时补上
+        game.player.health = game.player.max_health
+        game.game_over = False
+        while len(game.enemies) < SHOOTER_ENEMIES:
+            game.enemies.spawn(rng.randrange(module.SCREEN_WIDTH), rng.randrange(module.SCREEN_HEIGHT))
+        missing = SHOOTER_BULLETS - int(game.bullets.alive.sum())
+        for _ in range(max(missing, 0)):
+            game.bullets.fire(rng.randrange(module.SCREEN_WIDTH), rng.randrange(module.SCREEN_HEIGHT),
+                              rng.uniform(0, 2 * math.pi), module.OWNER_PLAYER)
+
+    def poll(self):
+        pygame.event.pump()
+        return self.game.input_source.poll(self.game.player)
+
+    def frame(self):
+        timer = self.timer
+        action = timer.run("input", self.poll)
+        timer.run("update", self.game.update, action)
+        timer.run("draw", self.game.draw)
+
+
+class MarioScenario:
+    name = "mario"
+    description = f"{MARIO_CHUNKS * 4} 个平台的长关卡, 一路向右奔跑跳跃"
+
+    def __init__(self, timer):
+        self.timer = timer
+        module = self.module = load_game("mario")
+        level = generate_level(MARIO_CHUNKS, platforms_per_chunk=4, seed=0)
+        game = self.game = module.Game(level=level)
+        self.frames = 0
+        timer.wrap(game, "handle_collisions", "collisions")
+        timer.wrap(module.PlatformIndex, "first_colliding", "collisions")
+        timer.wrap(module.PlatformIndex, "supports", "collisions")
+
+    def prepare(self):
+        # 跑到关卡尽头时从头开始
+        game = self.game
+        if game.camera_x >= game.world.width - self.module.SCREEN_WIDTH:
+            game.reset_game()
+
+    def poll(self):
+        pygame.event.pump()
+        self.frames += 1
+        return False, True, self.frames % 40 == 0
+
+    def frame(self):
+        timer = self.timer
+        left, right, jump = timer.run("input", self.poll)
+        timer.run("update", self.game.tick, left, right, jump)
+        timer.run("draw", self.game.draw)
+
+
+def snake_cycle(width, height):
+    # 覆盖整个棋盘的哈密顿回路: 第 0 列留作回程, 其余各列逐行蛇形往返
+    cells = []
+    for y in range(height):
+        xs = range(1, width) if y % 2 == 0 else range(width - 1, 0, -1)
+        cells.extend((x, y) for x in xs)
+    cells.extend((0, y) for y in range(height - 1, -1, -1))
+    return cells
+
+
+class SnakeScenario:
+    name = "snake"
+    description = f"蛇身占满 {SNAKE_FILL:.0%} 的棋盘 (py/snake_game.py)"
+
+    def __init__(self, timer):
+        self.timer = timer
+        module = self.module = load_game("snake")
+        size = module.BLOCK_SIZE
+        cells = snake_cycle(module.WINDOW_WIDTH // size, module.WINDOW_HEIGHT // size)
+        self.cycle = [(x * size, y * size) for x, y in cells]
+        self.next_cell = {cell: self.cycle[(i + 1) % len(self.cycle)]
+                          for i, cell in enumerate(self.cycle)}
+        self.game = module.Game(seed=0)
+        self.screen = open_window((module.WINDOW_WIDTH, module.WINDOW_HEIGHT), "snake")
+        self.background = module.build_background()
+        self.tiles = module.build_segment_tiles()
+        self.font = get_font(36)
+        self.fill()
+
+    def fill(self):
+        # 沿回路摆好占满棋盘 SNAKE_FILL 的蛇身, 蛇头在回路末端
+        module = self.module
+        snake = self.game.snake
+        length = int(len(self.cycle) * SNAKE_FILL)
+        snake.positions = deque(reversed(self.cycle[-length:]))
+        snake.length = length
+        snake.occupied = Counter(snake.positions)
+        snake.free = module.FreeCells(cell for cell in self.cycle if cell not in snake.occupied)
+        self.game.food.randomize_position(snake.free)
+
+    def prepare(self):
+        # 占满棋盘后游戏会重新开始, 这时重新摆好蛇身
+        if len(self.game.snake.positions) < len(self.cycle) * SNAKE_FILL / 2:
+            self.fill()
+
+    def poll(self):
+        pygame.event.pump()
+        head = self.game.snake.get_head_position()
+        x, y = self.next_cell[head]
+        size = self.module.BLOCK_SIZE
+        return self.module.DIRECTIONS.index(((x - head[0]) // size, (y - head[1]) // size))
+
+    def frame(self):
+        timer = self.timer
+        direction = timer.run("input", self.poll)
+        timer.run("update", self.game.tick, direction)
+        timer.run("draw", self.module.draw, self.screen, self.game, self.background, self.tiles,
+                  self.font)
+
+
+class TetrisScenario:
+    name = "tetris"
+    description = f"{TETRIS_STACK_ROWS} 行高的堆叠"
+
+    def __init__(self, timer):
+        self.timer = timer
+        module = self.module = load_game("tetris")
+        self.game = module.Tetris(seed=0)
+        self.frames = 0
+        timer.wrap(module.BitBoard, "fits", "collisions")
+        self.stack()
+
+    def stack(self):
+        # 底部 TETRIS_STACK_ROWS 行各留一个空洞 (不会被消除), 游戏结束后重新堆好
+        module = self.module
+        game = self.game
+        board = game.board = module.BitBoard()
+        for row in range(module.GRID_HEIGHT - TETRIS_STACK_ROWS, module.GRID_HEIGHT):
+            hole = row * 3 % module.GRID_WIDTH
+            board.rows[row] = board.full_row & ~(1 << hole)
+            board.colors[row] = [0 if x == hole else module.COLORS[(row + x) % len(module.COLORS)]
+                                 for x in range(module.GRID_WIDTH)]
+        game.game_over = False
+        game.current_piece = game.new_piece()
+
+    def prepare(self):
+        if self.game.game_over:
+            self.stack()
+
+    def poll(self):
+        # 固定的按键节奏: 左右移动、旋转, 每隔几帧加速下落
+        pygame.event.pump()
+        self.frames += 1
+        frame = self.frames
+        return frame % 12 == 0, frame % 12 == 6, frame % 3 == 0, frame % 20 == 10
+
+    def frame(self):
+        timer = self.timer
+        left, right, down, rotate = timer.run("input", self.poll)
+        timer.run("update", self.game.tick, left, right, down, rotate)
+        timer.run("draw", self.game.draw)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in
+             (ShooterScenario, MarioScenario, SnakeScenario, TetrisScenario)}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def gc_collections():
+    return sum(stats["collections"] for stats in gc.get_stats())
+
+
+def run_scenario(cls, frames=FRAMES):
+    timer = PhaseTimer()
+    try:
+        scenario = cls(timer)
+        for _ in range(WARMUP_FRAMES):
+            scenario.prepare()
+            scenario.frame()
+
+        # 计时
+        frame_times = []
+        phase_totals = dict.fromkeys(PHASES, 0.0)
+        collections = gc_collections()
+        for _ in range(frames):
+            scenario.prepare()
+            timer.start_frame()
+            scenario.frame()
+            frame_times.append(sum(timer.frame.values()))
+            for phase, elapsed in timer.frame.items():
+                phase_totals[phase] += elapsed
+        collections = gc_collections() - collections
+
+        # 分配: tracemalloc 会拖慢运行, 所以与计时分开进行
+        peaks = []
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        try:
+            for _ in range(min(frames, ALLOC_FRAMES)):
+                scenario.prepare()
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                scenario.frame()
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        finally:
+            tracemalloc.stop()
+        blocks = sys.getallocatedblocks() - blocks
+    finally:
+        timer.restore()
+
+    ms = 1000
+    return {
+        "frames": frames,
+        "p50_ms": percentile(frame_times, 0.5) * ms,
+        "p99_ms": percentile(frame_times, 0.99) * ms,
+        "mean_ms": sum(frame_times) / frames * ms,
+        "phases_ms": {phase: total / frames * ms for phase, total in phase_totals.items()},
+        "alloc_kb": percentile(peaks, 0.5) / 1024,
+        "alloc_blocks": blocks / len(peaks),
+        "gc_collections": collections,
+    }
+
+
+# 在子进程中执行: 导入游戏模块, 输出耗时和导入后各子系统的状态
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from replay import load_game
+load_game(sys.argv[1])
+elapsed = time.perf_counter() - start
+import pygame
+print(json.dumps({"import_ms": elapsed * 1000, "display": pygame.display.get_init(),
+                  "window": pygame.display.get_surface() is not None,
+                  "font": pygame.font.get_init(), "mixer": bool(pygame.mixer.get_init()),
+                  "joystick": pygame.joystick.get_init()}))
+"""
+SUBSYSTEMS = ("display", "window", "font", "mixer", "joystick")
+
+
+def measure_startup(game, runs=STARTUP_RUNS):
+    process_times = []
+    import_times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", STARTUP_PROBE, game], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        process_times.append(time.perf_counter() - start)
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        import_times.append(probe["import_ms"])
+    return {
+        "process_ms": percentile(process_times, 0.5) * 1000,
+        "import_ms": percentile(import_times, 0.5),
+        "side_effects": [name for name in SUBSYSTEMS if probe[name]],
+    }
+
+
+def report_startup(game, result, baseline=None):
+    base = baseline or {}
+    effects = ", ".join(result["side_effects"]) or "无"
+    print(f"{game}: 进程 {result['process_ms']:.0f}ms{change(result['process_ms'], base.get('process_ms'))}"
+          f"  导入 {result['import_ms']:.0f}ms{change(result['import_ms'], base.get('import_ms'))}"
+          f"  导入后已初始化: {effects}")
+
+
+def change(current, base):
+    if not base:
+        return ""
+    return f" ({(current - base) / base:+.0%})"
+
+
+def report(name, result, baseline=None):
+    base = baseline or {}
+    base_phases = base.get("phases_ms", {})
+    print(f"{name}: {SCENARIOS[name].description}, {result['frames']} 帧")
+    print(f"  帧时间  p50 {result['p50_ms']:.2f}ms{change(result['p50_ms'], base.get('p50_ms'))}"
+          f"  p99 {result['p99_ms']:.2f}ms{change(result['p99_ms'], base.get('p99_ms'))}"
+          f"  平均 {result['mean_ms']:.2f}ms{change(result['mean_ms'], base.get('mean_ms'))}")
+    phases = "  ".join(f"{PHASE_NAMES[phase]} {elapsed:.2f}ms{change(elapsed, base_phases.get(phase))}"
+                       for phase, elapsed in result["phases_ms"].items())
+    print(f"  各阶段  {phases}")
+    print(f"  分配    每帧峰值 {result['alloc_kb']:.1f}KB{change(result['alloc_kb'], base.get('alloc_kb'))}"
+          f"  每帧净增 {result['alloc_blocks']:+.1f} 块"
+          f"  GC {result['gc_collections']} 次{change(result['gc_collections'], base.get('gc_collections'))}")
+
+
+def baseline_option(argv, name):
+    # --save / --compare 后面可以不跟文件名, 这时使用默认的基线文件
+    if name not in argv:
+        return None
+    index = argv.index(name) + 1
+    if index < len(argv) and not argv[index].startswith("--") and argv[index] not in GAMES:
+        return argv[index]
+    return BASELINE_PATH
+
+
+if __name__ == "__main__":
+    # 不带场景名时运行全部场景
+    argv = sys.argv[1:]
+    frames = int(argv[argv.index("--frames") + 1]) if "--frames" in argv else FRAMES
+    save_path = baseline_option(argv, "--save")
+    compare_path = baseline_option(argv, "--compare")
+    startup = "--startup" in argv
+    choices = GAMES if startup else SCENARIOS
+    names = [arg for arg in argv if arg in choices] or list(choices)
+
+    baselines = {}
+    if compare_path:
+        with open(compare_path, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    results = {}
+    for name in names:
+        if startup:
+            # 冷启动结果在基线文件中以 "游戏名:startup" 为键
+            key = f"{name}:startup"
+            results[key] = measure_startup(name)
+            report_startup(name, results[key], baselines.get(key))
+        else:
+            results[name] = run_scenario(SCENARIOS[name], frames)
+            report(name, results[name], baselines.get(name))
+
+    if save_path:
+        # 只覆盖本次运行过的场景, 其他场景的基线保留
+        saved = {}
+        if os.path.exists(save_path):
+            with open(save_path, encoding="utf-8") as f:
+                saved = json.load(f)
+        saved.update(results)
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump(saved, f, indent=2, ensure_ascii=False)
+        print(f"基线已保存到 {save_path}")
@@ -0,0 +1,52 @@
+import pygame
+
+# 脏矩形渲染: 记录每帧发生变化的区域, 只把这些区域提交到显示器,
+# 代替整屏 pygame.display.flip()。上一帧的区域也一并提交, 以擦除物体移走后留下的旧图像。
+
+MAX_DIRTY_RECTS = 256  # 超过这个数量时直接整屏刷新更划算
+
+
+class DirtyRects:
+    def __init__(self, max_rects=MAX_DIRTY_RECTS):
+        self.max_rects = max_rects
+        self.previous = []
+        self.current = []
+        self.erase = []
+        self.full = True  # 第一帧必须整屏刷新
+
+    def add(self, rect):
+        if rect:
+            self.current.append(rect)
+
+    def add_all(self, rects):
+        for rect in rects:
+            if rect:
+                self.current.append(rect)
+
+    def invalidate(self, rect=None):
+        # 不带参数时下一帧整屏刷新; 带参数时擦除并刷新该区域 (例如被拾取的金币)
+        if rect is None:
+            self.full = True
+        else:
+            self.erase.append(rect)
+
+    def restore(self, screen, background):
+        # 用背景覆盖上一帧绘制过的区域, 之后再在其上绘制本帧内容
+        if self.full:
+            screen.blit(background, (0, 0))
+            return
+        for rect in self.previous:
+            screen.blit(background, rect, rect)
+        for rect in self.erase:
+            screen.blit(background, rect, rect)
+
+    def present(self):
+        rects = self.previous + self.erase + self.current
+        if self.full or len(rects) > self.max_rects:
+            pygame.display.flip()
+        elif rects:
+            pygame.display.update(rects)
+        self.previous = self.current
+        self.current = []
+        self.erase = []
+        self.full = False
@@ -0,0 +1,193 @@
+import csv
+import json
+import sys
+import time
+from collections import deque
+
+import pygame
+
+from render_cache import get_font
+
+# 帧分析器: 游戏循环用 begin_frame/end_frame 包住一帧 (不含 clock.tick 的等待),
+# 用 with profiler.scope("名字") 包住各阶段, 记录每个阶段的独占时间 (嵌套阶段的时间从外层扣除)。
+# 按 F3 显示最近帧时间的直方图, --profile 文件 把每帧数据导出为 CSV (.csv) 或 JSON lines (其他扩展名)。
+# 覆盖层和导出都关闭时 scope() 返回空操作对象, begin_frame/end_frame 直接返回, 几乎没有开销;
+# 开关只在下一帧开始时生效, 所以一帧内的计时总是完整的。
+
+SCOPES = ("events", "update", "collisions", "draw")  # CSV 的固定列, 其他阶段只出现在 JSON lines 中
+HISTORY_FRAMES = 240
+HISTOGRAM_BUCKETS = 34  # 每格 1ms, 最后一格包含所有更慢的帧
+TARGET_MS = 1000 / 60
+OVERLAY_SIZE = (250, 140)
+OVERLAY_REFRESH = 10  # 每隔这么多帧重新绘制一次覆盖层
+FLUSH_INTERVAL = 60
+
+
+class _NullScope:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.stack.append([time.perf_counter(), 0.0])
+
+    def __exit__(self, *exc):
+        profiler = self.profiler
+        start, nested = profiler.stack.pop()
+        elapsed = time.perf_counter() - start
+        times = profiler.current
+        times[self.name] = times.get(self.name, 0.0) + elapsed - nested
+        if profiler.stack:
+            profiler.stack[-1][1] += elapsed
+        return False
+
+
+class MetricsExporter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.csv = None
+        if path.lower().endswith(".csv"):
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(["frame", "total_ms"] + [f"{name}_ms" for name in SCOPES] + ["other_ms"])
+
+    def write(self, frame, total, times):
+        total_ms = total * 1000
+        if self.csv:
+            scoped = [times.get(name, 0.0) * 1000 for name in SCOPES]
+            other = total_ms - sum(times.values()) * 1000
+            self.csv.writerow([frame] + [f"{value:.3f}" for value in [total_ms] + scoped + [other]])
+        else:
+            record = {"frame": frame, "total_ms": round(total_ms, 3),
+                      "scopes": {name: round(value * 1000, 3) for name, value in times.items()}}
+            self.file.write(json.dumps(record) + "\n")
+        if frame % FLUSH_INTERVAL == 0:
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class FrameProfiler:
+    def __init__(self, history=HISTORY_FRAMES):
+        self.enabled = False
+        self.overlay = False
+        self.exporter = None
+        self.history = deque(maxlen=history)
+        self.scopes = {}
+        self.stack = []
+        self.current = {}
+        self.frame = 0
+        self.frame_start = 0.0
+        self.panel = None
+        self.panel_age = 0
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        scope = self.scopes.get(name)
+        if scope is None:
+            scope = self.scopes[name] = _Scope(self, name)
+        return scope
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self.panel = None
+
+    def export(self, path):
+        self.close()
+        self.exporter = MetricsExporter(path)
+
+    def begin_frame(self):
+        self.enabled = self.overlay or self.exporter is not None
+        if not self.enabled:
+            return
+        self.current = {}
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self.frame_start
+        self.frame += 1
+        self.history.append((total, self.current))
+        if self.exporter:
+            self.exporter.write(self.frame, total, self.current)
+
+    def draw_overlay(self, screen):
+        # 在屏幕右下角画出帧时间直方图和各阶段平均耗时, 返回绘制的区域 (供脏矩形使用)
+        if not self.overlay or not self.history:
+            return None
+        self.panel_age += 1
+        if self.panel is None or self.panel_age >= OVERLAY_REFRESH:
+            self.panel = self.render_panel()
+            self.panel_age = 0
+        width, height = screen.get_size()
+        return screen.blit(self.panel, (width - OVERLAY_SIZE[0] - 10, height - OVERLAY_SIZE[1] - 10))
+
+    def render_panel(self):
+        panel = pygame.Surface(OVERLAY_SIZE)
+        panel.fill((20, 20, 20))
+        panel.set_alpha(210)
+        width, height = OVERLAY_SIZE
+        font = get_font(18)
+
+        totals = sorted(total * 1000 for total, _ in self.history)
+        count = len(totals)
+        p50 = totals[count // 2]
+        p99 = totals[min(int(count * 0.99), count - 1)]
+        means = dict.fromkeys(SCOPES, 0.0)
+        for _, times in self.history:
+            for name, value in times.items():
+                means[name] = means.get(name, 0.0) + value * 1000 / count
+
+        # 第一行是帧时间, 之后每行两个阶段的平均耗时
+        items = [f"{name} {value:.2f}" for name, value in means.items() if value]
+        lines = [f"frame p50 {p50:.2f}  p99 {p99:.2f}  max {totals[-1]:.2f} ms"]
+        lines += ["  ".join(items[i:i + 2]) for i in range(0, len(items), 2)]
+        for i, line in enumerate(lines):
+            panel.blit(font.render(line, True, (230, 230, 230)), (6, 4 + i * 16))
+
+        # 直方图: 每格 1ms, 高度按最多的一格归一化, 竖线标出 60 FPS 的帧预算
+        buckets = [0] * HISTOGRAM_BUCKETS
+        for value in totals:
+            buckets[min(int(value), HISTOGRAM_BUCKETS - 1)] += 1
+        top = 8 + len(lines) * 16
+        bottom = height - 6
+        bar_width = (width - 12) // HISTOGRAM_BUCKETS
+        peak = max(buckets)
+        for i, bucket in enumerate(buckets):
+            if not bucket:
+                continue
+            bar = max(1, (bottom - top) * bucket // peak)
+            color = (90, 200, 90) if i < TARGET_MS else (220, 90, 70)
+            pygame.draw.rect(panel, color, (6 + i * bar_width, bottom - bar, bar_width - 1, bar))
+        target_x = 6 + int(TARGET_MS * bar_width)
+        pygame.draw.line(panel, (230, 230, 90), (target_x, top), (target_x, bottom))
+        return panel
+
+    def close(self):
+        if self.exporter:
+            self.exporter.close()
+            self.exporter = None
+
+
+profiler = FrameProfiler()
+
+
+def start_profiling(argv=None):
+    # --profile 文件: 从第一帧起导出每帧数据
+    argv = sys.argv if argv is None else argv
+    if "--profile" in argv:
+        profiler.export(argv[argv.index("--profile") + 1])
+    return profiler
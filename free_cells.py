@@ -0,0 +1,37 @@
+import random
+
+# 空闲格子索引: 数组保存所有空闲格子, 字典记录每个格子在数组中的下标。
+# 占用时与末尾元素交换后删除, 释放时追加到末尾, 随机抽取一个空闲格子都是 O(1)。
+
+
+class FreeCells:
+    def __init__(self, cells):
+        self.cells = list(cells)
+        self.index = {cell: i for i, cell in enumerate(self.cells)}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return cell in self.index
+
+    def occupy(self, cell):
+        i = self.index.pop(cell, None)
+        if i is None:
+            return
+        last = self.cells.pop()
+        if i < len(self.cells):
+            self.cells[i] = last
+            self.index[last] = i
+
+    def release(self, cell):
+        if cell in self.index:
+            return
+        self.index[cell] = len(self.cells)
+        self.cells.append(cell)
+
+    def sample(self, rng=random):
+        # 均匀随机返回一个空闲格子, 没有空闲格子时返回 None
+        if not self.cells:
+            return None
+        return self.cells[rng.randrange(len(self.cells))]
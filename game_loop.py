@@ -0,0 +1,72 @@
+import sys
+import time
+
+import pygame
+
+from frame_profiler import profiler
+
+# 固定时间步长的游戏循环: 逻辑帧按固定的 tick_rate 推进, 与渲染帧率无关。
+# 每个渲染帧把真实流逝的时间加进累加器, 累加器够一个步长就推进一个逻辑帧;
+# 一帧内最多追赶 max_steps 个逻辑帧, 卡顿后不会越追越慢 (多出的时间直接丢弃)。
+# 绘制时传入 alpha = 累加器余量 / 步长, 游戏据此在上一个和当前逻辑帧的状态之间插值,
+# 逻辑帧率低于渲染帧率时画面依然平滑。
+#
+# 游戏提供三个回调: handle_events() 处理本帧的事件 (调用 loop.stop() 结束循环),
+# update() 推进一个逻辑帧 (一次性的输入如按键、点击只应用于本帧的第一个逻辑帧),
+# draw(alpha) 绘制。录像按逻辑帧记录, 所以回放与渲染帧率无关。
+
+RENDER_FPS = 60  # 默认渲染帧率, 可用 --render-fps N 修改
+MAX_CATCH_UP = 5  # 一个渲染帧内最多推进的逻辑帧数
+MAX_FRAME_TIME = 0.25  # 单帧计入的最长时间 (秒), 例如拖动窗口造成的长时间停顿
+
+
+def render_fps(argv=None):
+    argv = sys.argv if argv is None else argv
+    if "--render-fps" in argv:
+        return int(argv[argv.index("--render-fps") + 1])
+    return RENDER_FPS
+
+
+class FixedStepLoop:
+    def __init__(self, tick_rate, fps=None, max_steps=MAX_CATCH_UP):
+        self.dt = 1.0 / tick_rate
+        self.fps = fps if fps is not None else render_fps()
+        self.max_steps = max_steps
+        self.clock = pygame.time.Clock()
+        self.running = False
+        self.ticks = 0
+
+    def stop(self):
+        self.running = False
+
+    def run(self, handle_events, update, draw):
+        dt = self.dt
+        accumulator = dt  # 第一帧立即推进一个逻辑帧
+        previous = time.perf_counter()
+        self.running = True
+        while self.running:
+            profiler.begin_frame()
+            now = time.perf_counter()
+            accumulator += min(now - previous, MAX_FRAME_TIME)
+            previous = now
+
+            with profiler.scope("events"):
+                handle_events()
+            if not self.running:
+                break
+
+            with profiler.scope("update"):
+                steps = 0
+                while accumulator >= dt and steps < self.max_steps and self.running:
+                    update()
+                    accumulator -= dt
+                    steps += 1
+                    self.ticks += 1
+                if accumulator >= dt:
+                    # 追赶不上: 丢弃积压的时间, 保留不足一个步长的余量
+                    accumulator %= dt
+
+            with profiler.scope("draw"):
+                draw(min(accumulator / dt, 1.0))
+            profiler.end_frame()
+            self.clock.tick(self.fps)
@@ -1,9 +1,13 @@
 import pygame
 import random
 import sys
-
-# 初始化 Pygame
-pygame.init()
+from collections import deque
+from free_cells import FreeCells
+from snake_autopilot import Autopilot
+from replay import open_recorder, session_seed, state_digest
+from frame_profiler import profiler, start_profiling
+from game_loop import FixedStepLoop
+from window import open_window
 
 # 设置游戏窗口
 WINDOW_WIDTH = 800
@@ -11,6 +15,7 @@ WINDOW_HEIGHT = 600
 GRID_SIZE = 20
 GRID_WIDTH = WINDOW_WIDTH // GRID_SIZE
 GRID_HEIGHT = WINDOW_HEIGHT // GRID_SIZE
+GAME_SPEED = 10  # 逻辑帧率 (每秒移动的格数), 渲染帧率见 game_loop
 
 # 颜色定义
 WHITE = (255, 255, 255)
@@ -18,15 +23,21 @@ GREEN = (0, 255, 0)
 RED = (255, 0, 0)
 BLACK = (0, 0, 0)
 
-# 创建游戏窗口
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption('贪吃蛇')
+# 录像中每帧的输入记录: 本帧移动前的方向 (DIRECTION_NAMES 中的下标)
+DIRECTION_NAMES = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+RECORD_FORMAT = '<B'
 
+# 蛇身用双端队列保存, 另用集合记录占用的格子, 移动和自身碰撞检测都是常数时间;
+# free 是与之互补的空闲格子索引, 用于 O(1) 生成食物
 class Snake:
     def __init__(self):
-        self.body = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
+        self.body = deque([(GRID_WIDTH // 2, GRID_HEIGHT // 2)])
+        self.occupied = set(self.body)
+        self.free = FreeCells((x, y) for y in range(GRID_HEIGHT) for x in range(GRID_WIDTH))
+        self.free.occupy(self.body[0])
         self.direction = 'RIGHT'
         self.grow = False
+        self.collided = False  # 最近一次移动是否撞到自己
 
     def move(self):
         head = self.body[0]
@@ -39,34 +50,90 @@ class Snake:
         else:  # RIGHT
             new_head = (head[0] + 1, head[1])
         
-        self.body.insert(0, new_head)
+        # 先移走尾巴, 蛇头可以进入尾巴刚离开的格子
         if not self.grow:
-            self.body.pop()
+            tail = self.body.pop()
+            self.occupied.discard(tail)
+            self.free.release(tail)
         self.grow = False
+        self.collided = new_head in self.occupied
+        self.body.appendleft(new_head)
+        self.occupied.add(new_head)
+        self.free.occupy(new_head)
 
     def change_direction(self, new_direction):
         opposite_directions = {'UP': 'DOWN', 'DOWN': 'UP', 'LEFT': 'RIGHT', 'RIGHT': 'LEFT'}
         if new_direction != opposite_directions.get(self.direction):
             self.direction = new_direction
 
-def generate_food(snake):
-    while True:
-        food = (random.randint(0, GRID_WIDTH - 1), random.randint(0, GRID_HEIGHT - 1))
-        if food not in snake.body:
-            return food
+def generate_food(snake, rng=random):
+    # 从空闲格子中均匀抽取, 蛇占满整个棋盘时返回 None
+    return snake.free.sample(rng)
+
+# 一局游戏的状态; 食物位置来自以 seed 初始化的随机数生成器, 同样的种子和输入总是得到同样的一局
+class Game:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.snake = Snake()
+        self.food = generate_food(self.snake, self.rng)
+        self.score = 0
+        self.game_over = False
+
+    def tick(self, direction):
+        # 一个逻辑帧: direction 为移动前的方向下标; 录制和回放都以它为单位
+        snake = self.snake
+        snake.direction = DIRECTION_NAMES[direction]
+
+        # 移动蛇
+        snake.move()
+        head = snake.body[0]
+
+        # 检查是否吃到食物
+        if head == self.food:
+            snake.grow = True
+            self.food = generate_food(snake, self.rng)
+            self.score += 1
+            if self.food is None:
+                # 没有空位了: 胜利
+                self.game_over = True
+
+        # 检查游戏是否结束
+        if (head[0] < 0 or head[0] >= GRID_WIDTH or
+            head[1] < 0 or head[1] >= GRID_HEIGHT or
+            snake.collided):
+            self.game_over = True
+
+    def state_hash(self):
+        snake = self.snake
+        return state_digest(list(snake.body), snake.direction, snake.grow, self.food,
+                            self.score, self.game_over)
+
+def make_replay(log):
+    return Game(log.seed)
+
+# 自动驾驶给出的 (dx, dy) 对应的方向名
+STEP_NAMES = {(0, -1): 'UP', (0, 1): 'DOWN', (-1, 0): 'LEFT', (1, 0): 'RIGHT'}
 
 def main():
-    clock = pygame.time.Clock()
-    snake = Snake()
-    food = generate_food(snake)
-    score = 0
-    game_over = False
-
-    while True:
+    # --seed N 固定随机种子, --record 文件 录制本局输入 (用 replay.py 回放)
+    # --profile 文件 导出每帧的分阶段耗时 (.csv 或 JSON lines), F3 显示帧时间直方图
+    seed = session_seed()
+    start_profiling()
+    game = Game(seed)
+    snake = game.snake
+    recorder = open_recorder('snake_classic', seed, RECORD_FORMAT)
+    # 创建游戏窗口 (导入本模块不会打开窗口)
+    screen = open_window((WINDOW_WIDTH, WINDOW_HEIGHT), '贪吃蛇')
+    # --autopilot: 由寻路自动驾驶控制方向
+    pilot = Autopilot(GRID_WIDTH, GRID_HEIGHT) if '--autopilot' in sys.argv else None
+
+    # 固定步长循环: 蛇每秒移动 GAME_SPEED 格, 渲染帧率与之无关
+    loop = FixedStepLoop(GAME_SPEED)
+
+    def handle_events():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                loop.stop()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_UP:
                     snake.change_direction('UP')
@@ -76,38 +143,55 @@ def main():
                     snake.change_direction('LEFT')
                 elif event.key == pygame.K_RIGHT:
                     snake.change_direction('RIGHT')
-
-        if not game_over:
-            # 移动蛇
-            snake.move()
-            head = snake.body[0]
-
-            # 检查是否吃到食物
-            if head == food:
-                snake.grow = True
-                food = generate_food(snake)
-                score += 1
-
-            # 检查游戏是否结束
-            if (head[0] < 0 or head[0] >= GRID_WIDTH or
-                head[1] < 0 or head[1] >= GRID_HEIGHT or
-                head in snake.body[1:]):
-                game_over = True
-
-            # 绘制游戏画面
-            screen.fill(BLACK)
-            
-            # 绘制食物
+                elif event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+
+    def update():
+        # 游戏结束后画面停在最后一帧
+        if game.game_over:
+            return
+        if pilot is not None:
+            step = pilot.choose(snake.body, snake.occupied, game.food, snake.grow)
+            if step is not None:
+                snake.change_direction(STEP_NAMES[step])
+
+        # 移动蛇, 检查食物和游戏结束
+        direction = DIRECTION_NAMES.index(snake.direction)
+        if recorder:
+            recorder.record(direction)
+        game.tick(direction)
+        if game.game_over and recorder:
+            recorder.close(game.state_hash())
+
+    def draw(alpha):
+        # 蛇按格移动, 不插值
+        food = game.food
+
+        # 绘制游戏画面
+        screen.fill(BLACK)
+        
+        # 绘制食物
+        if food is not None:
             food_rect = pygame.Rect(food[0] * GRID_SIZE, food[1] * GRID_SIZE, GRID_SIZE, GRID_SIZE)
             pygame.draw.rect(screen, RED, food_rect)
 
-            # 绘制蛇
-            for segment in snake.body:
-                segment_rect = pygame.Rect(segment[0] * GRID_SIZE, segment[1] * GRID_SIZE, GRID_SIZE, GRID_SIZE)
-                pygame.draw.rect(screen, GREEN, segment_rect)
+        # 绘制蛇
+        for segment in snake.body:
+            segment_rect = pygame.Rect(segment[0] * GRID_SIZE, segment[1] * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+            pygame.draw.rect(screen, GREEN, segment_rect)
+
+        # 帧分析覆盖层 (F3)
+        profiler.draw_overlay(screen)
+
+        pygame.display.flip()
+
+    loop.run(handle_events, update, draw)
 
-            pygame.display.flip()
-            clock.tick(10)  # 控制游戏速度
+    if recorder:
+        recorder.close(game.state_hash())
+    profiler.close()
+    pygame.quit()
+    sys.exit()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,15 +1,23 @@
+import os
 import pygame
 import sys
-import random
-
-# 初始化pygame
-pygame.init()
+from collections import namedtuple
+from dirty_rects import DirtyRects
+from frame_profiler import profiler, start_profiling
+from game_loop import FixedStepLoop
+from render_cache import get_font, get_sprite, optimize
+from mario_level import MappedLevel, default_level, generate_level
+from replay import open_recorder, session_seed, state_digest
+from window import open_window
 
 # 游戏常量
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 GROUND_HEIGHT = 100
-FPS = 60
+FPS = 60  # 逻辑帧率, 物理常量按每个逻辑帧计算; 渲染帧率见 game_loop
+PLATFORM_CELL_SIZE = 128  # 平台索引的网格边长
+CAMERA_LEAD = SCREEN_WIDTH // 3  # 相机跟随时玩家距画面左边的距离
+ENEMY_FOOTING = 10  # 敌人脚底与平台顶边相差不超过该值即视为站在平台上
 
 # 颜色定义
 WHITE = (255, 255, 255)
@@ -20,6 +28,38 @@ YELLOW = (255, 255, 0)
 BROWN = (139, 69, 19)
 BLACK = (0, 0, 0)
 
+# 一帧的玩家输入
+Controls = namedtuple("Controls", ["left", "right", "jump"])
+
+# 录像中每帧的输入记录: Controls 加上重置游戏
+RECORD_FORMAT = "<????"
+
+def read_controls():
+    keys = pygame.key.get_pressed()
+    return Controls(bool(keys[pygame.K_LEFT] or keys[pygame.K_a]),
+                    bool(keys[pygame.K_RIGHT] or keys[pygame.K_d]),
+                    bool(keys[pygame.K_SPACE] or keys[pygame.K_UP] or keys[pygame.K_w]))
+
+# 实体外观的精灵: 每种外观只绘制一次, 之后从 render_cache 的精灵缓存中直接贴图
+def draw_player_sprite(surface, key):
+    surface.fill(RED)
+    # 眼睛
+    pygame.draw.circle(surface, WHITE, (8, 10), 3)
+    pygame.draw.circle(surface, WHITE, (22, 10), 3)
+    pygame.draw.circle(surface, BLACK, (9, 10), 1)
+    pygame.draw.circle(surface, BLACK, (23, 10), 1)
+
+def draw_enemy_sprite(surface, key):
+    surface.fill(YELLOW)
+    pygame.draw.circle(surface, BLACK, (8, 8), 2)
+    pygame.draw.circle(surface, BLACK, (17, 8), 2)
+
+def draw_coin_sprite(surface, key):
+    _, radius = key
+    center = (radius + 1, radius + 1)
+    pygame.draw.circle(surface, YELLOW, center, radius)
+    pygame.draw.circle(surface, BLACK, center, radius, 2)
+
 class Player:
     def __init__(self, x, y):
         self.x = x
@@ -33,19 +73,24 @@ class Player:
         self.gravity = 0.8
         self.on_ground = False
         self.rect = pygame.Rect(x, y, self.width, self.height)
+        # 上一个逻辑帧的位置, 绘制时在两帧之间插值
+        self.prev_x = x
+        self.prev_y = y
+        
+    def update(self, world, controls):
+        self.prev_x = self.x
+        self.prev_y = self.y
         
-    def update(self, platforms):
         # 处理水平移动
-        keys = pygame.key.get_pressed()
         self.vel_x = 0
         
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        if controls.left:
             self.vel_x = -self.speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        if controls.right:
             self.vel_x = self.speed
             
         # 跳跃
-        if (keys[pygame.K_SPACE] or keys[pygame.K_UP] or keys[pygame.K_w]) and self.on_ground:
+        if controls.jump and self.on_ground:
             self.vel_y = self.jump_power
             self.on_ground = False
             
@@ -59,21 +104,21 @@ class Player:
         # 边界检查
         if self.x < 0:
             self.x = 0
-        elif self.x > SCREEN_WIDTH - self.width:
-            self.x = SCREEN_WIDTH - self.width
+        elif self.x > world.width - self.width:
+            self.x = world.width - self.width
             
         # 更新碰撞矩形
         self.rect.x = self.x
         self.rect.y = self.y
         
-        # 平台碰撞检测
+        # 平台碰撞检测 (只检查附近的平台)
         self.on_ground = False
-        for platform in platforms:
-            if self.rect.colliderect(platform.rect):
-                if self.vel_y > 0:  # 下降时
-                    self.y = platform.rect.top - self.height
-                    self.vel_y = 0
-                    self.on_ground = True
+        if self.vel_y > 0:  # 下降时
+            platform = world.platform_index.first_colliding(self.rect)
+            if platform is not None:
+                self.y = platform.rect.top - self.height
+                self.vel_y = 0
+                self.on_ground = True
                     
         # 地面碰撞检测
         if self.y >= SCREEN_HEIGHT - GROUND_HEIGHT - self.height:
@@ -81,14 +126,13 @@ class Player:
             self.vel_y = 0
             self.on_ground = True
             
-    def draw(self, screen):
-        # 绘制玩家（简单的红色矩形）
-        pygame.draw.rect(screen, RED, (self.x, self.y, self.width, self.height))
-        # 绘制眼睛
-        pygame.draw.circle(screen, WHITE, (int(self.x + 8), int(self.y + 10)), 3)
-        pygame.draw.circle(screen, WHITE, (int(self.x + 22), int(self.y + 10)), 3)
-        pygame.draw.circle(screen, BLACK, (int(self.x + 9), int(self.y + 10)), 1)
-        pygame.draw.circle(screen, BLACK, (int(self.x + 23), int(self.y + 10)), 1)
+    def draw(self, screen, camera_x=0, alpha=1.0):
+        # 绘制玩家（带眼睛的红色矩形）, alpha 为两个逻辑帧之间的插值系数
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
+        sprite = get_sprite(("mario_player", self.width, self.height),
+                            (self.width, self.height), draw_player_sprite, alpha=False)
+        return screen.blit(sprite, (int(x - camera_x), int(y)))
 
 class Platform:
     def __init__(self, x, y, width, height):
@@ -98,9 +142,59 @@ class Platform:
         self.height = height
         self.rect = pygame.Rect(x, y, width, height)
         
-    def draw(self, screen):
-        pygame.draw.rect(screen, BROWN, self.rect)
-        pygame.draw.rect(screen, BLACK, self.rect, 2)
+    def draw(self, screen, camera_x=0):
+        rect = self.rect.move(-camera_x, 0)
+        pygame.draw.rect(screen, BROWN, rect)
+        pygame.draw.rect(screen, BLACK, rect, 2)
+
+# 静态平台的均匀网格索引, 关卡加载时建立一次。
+# 每个平台登记到它覆盖的所有格子里, 查询时只检查查询范围内格子中的平台;
+# 平台边界另存为平铺的列表, 查询过程中不创建 Rect。
+class PlatformIndex:
+    def __init__(self, platforms, cell_size=PLATFORM_CELL_SIZE):
+        self.platforms = platforms
+        self.cell_size = cell_size
+        self.lefts = [platform.rect.left for platform in platforms]
+        self.tops = [platform.rect.top for platform in platforms]
+        self.rights = [platform.rect.right for platform in platforms]
+        self.bottoms = [platform.rect.bottom for platform in platforms]
+        self.cells = {}
+        for i, platform in enumerate(platforms):
+            rect = platform.rect
+            if rect.width <= 0 or rect.height <= 0:
+                continue
+            for cx in range(rect.left // cell_size, (rect.right - 1) // cell_size + 1):
+                for cy in range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1):
+                    self.cells.setdefault((cx, cy), []).append(i)
+
+    def first_colliding(self, rect):
+        # 与 rect 相交的平台中列表顺序最靠前的一个, 与原来逐个扫描的结果相同
+        left, top, right, bottom = rect.left, rect.top, rect.right, rect.bottom
+        size = self.cell_size
+        cells = self.cells
+        lefts, tops, rights, bottoms = self.lefts, self.tops, self.rights, self.bottoms
+        best = -1
+        for cx in range(left // size, (right - 1) // size + 1):
+            for cy in range(top // size, (bottom - 1) // size + 1):
+                for i in cells.get((cx, cy), ()):
+                    if (left < rights[i] and right > lefts[i] and
+                            top < bottoms[i] and bottom > tops[i] and
+                            (best < 0 or i < best)):
+                        best = i
+        return self.platforms[best] if best >= 0 else None
+
+    def supports(self, left, right, bottom):
+        # 是否有平台的顶边在 [bottom - ENEMY_FOOTING, bottom] 内且与 [left, right) 水平重叠
+        size = self.cell_size
+        cells = self.cells
+        lefts, tops, rights = self.lefts, self.tops, self.rights
+        for cx in range(left // size, (right - 1) // size + 1):
+            for cy in range((bottom - ENEMY_FOOTING) // size, bottom // size + 1):
+                for i in cells.get((cx, cy), ()):
+                    top = tops[i]
+                    if top <= bottom <= top + ENEMY_FOOTING and right > lefts[i] and left < rights[i]:
+                        return True
+        return False
 
 class Enemy:
     def __init__(self, x, y, speed=2):
@@ -111,41 +205,30 @@ class Enemy:
         self.speed = speed
         self.direction = 1
         self.rect = pygame.Rect(x, y, self.width, self.height)
+        self.prev_x = x
         
-    def update(self, platforms):
+    def update(self, world):
+        platform_index = world.platform_index
+        self.prev_x = self.x
         self.x += self.speed * self.direction
         
         # 边界反弹
-        if self.x <= 0 or self.x >= SCREEN_WIDTH - self.width:
+        if self.x <= 0 or self.x >= world.width - self.width:
             self.direction *= -1
             
         # 平台边缘检测
         self.rect.x = self.x
-        on_platform = False
-        for platform in platforms:
-            if (self.rect.bottom >= platform.rect.top and 
-                self.rect.bottom <= platform.rect.top + 10 and
-                self.rect.right > platform.rect.left and 
-                self.rect.left < platform.rect.right):
-                on_platform = True
-                break
+        on_platform = platform_index.supports(self.rect.left, self.rect.right, self.rect.bottom)
                 
         # 地面检测
         if self.y >= SCREEN_HEIGHT - GROUND_HEIGHT - self.height:
             on_platform = True
             
-        # 如果不在平台上，改变方向
+        # 如果不在平台上，改变方向 (下一步的位置按 Rect 构造时的取整方式计算, 不创建 Rect)
         next_x = self.x + self.speed * self.direction
-        next_rect = pygame.Rect(next_x, self.y, self.width, self.height)
-        next_on_platform = False
-        
-        for platform in platforms:
-            if (next_rect.bottom >= platform.rect.top and 
-                next_rect.bottom <= platform.rect.top + 10 and
-                next_rect.right > platform.rect.left and 
-                next_rect.left < platform.rect.right):
-                next_on_platform = True
-                break
+        next_left = int(next_x)
+        next_on_platform = platform_index.supports(next_left, next_left + self.width,
+                                                   int(self.y) + self.height)
                 
         if next_x >= SCREEN_HEIGHT - GROUND_HEIGHT - self.height:
             next_on_platform = True
@@ -153,10 +236,11 @@ class Enemy:
         if on_platform and not next_on_platform:
             self.direction *= -1
             
-    def draw(self, screen):
-        pygame.draw.rect(screen, YELLOW, (self.x, self.y, self.width, self.height))
-        pygame.draw.circle(screen, BLACK, (int(self.x + 8), int(self.y + 8)), 2)
-        pygame.draw.circle(screen, BLACK, (int(self.x + 17), int(self.y + 8)), 2)
+    def draw(self, screen, camera_x=0, alpha=1.0):
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        sprite = get_sprite(("mario_enemy", self.width, self.height),
+                            (self.width, self.height), draw_enemy_sprite, alpha=False)
+        return screen.blit(sprite, (int(x - camera_x), int(self.y)))
 
 class Coin:
     def __init__(self, x, y):
@@ -167,56 +251,167 @@ class Coin:
                                self.radius * 2, self.radius * 2)
         self.collected = False
         
-    def draw(self, screen):
+    def draw(self, screen, camera_x=0):
         if not self.collected:
-            pygame.draw.circle(screen, YELLOW, (int(self.x), int(self.y)), self.radius)
-            pygame.draw.circle(screen, BLACK, (int(self.x), int(self.y)), self.radius, 2)
+            offset = self.radius + 1
+            sprite = get_sprite(("coin", self.radius), (offset * 2 + 1, offset * 2 + 1),
+                                draw_coin_sprite)
+            screen.blit(sprite, (int(self.x - camera_x) - offset, int(self.y) - offset))
+
+# 按相机位置流式载入关卡区块: 只有相机附近 (左右各多载入一个区块) 的区块中的实体会被创建、
+# 更新和绘制, 落到窗口之外的区块直接丢弃, 内存和每帧开销与关卡长度无关。
+# 被踩扁的敌人和收集过的金币按 (区块, 序号) 记录, 区块重新载入时不再出现。
+class World:
+    def __init__(self, level):
+        self.level = level
+        self.width = level.width
+        self.removed = set()
+        self.reset()
+
+    def reset(self):
+        self.removed.clear()
+        self.chunks = {}  # 区块下标 -> (平台, 敌人, 金币)
+        self.window = None
+        self.platforms = []
+        self.enemies = []
+        self.coins = []
+        self.platform_index = PlatformIndex(self.platforms)
+
+    def load_chunk(self, index):
+        data = self.level.chunk(index)
+        platforms = [Platform(*spec) for spec in data.platforms]
+        enemies = []
+        for slot, spec in enumerate(data.enemies):
+            if ("enemy", index, slot) not in self.removed:
+                enemy = Enemy(*spec)
+                enemy.key = ("enemy", index, slot)
+                enemies.append(enemy)
+        coins = []
+        for slot, spec in enumerate(data.coins):
+            coin = Coin(*spec)
+            coin.key = ("coin", index, slot)
+            coin.collected = coin.key in self.removed
+            coins.append(coin)
+        return platforms, enemies, coins
+
+    def stream(self, camera_x):
+        # 载入相机窗口附近的区块、丢弃其余区块; 窗口变化时返回 True
+        chunk_width = self.level.chunk_width
+        first = max(camera_x // chunk_width - 1, 0)
+        last = min((camera_x + SCREEN_WIDTH) // chunk_width + 1, len(self.level) - 1)
+        if (first, last) == self.window:
+            return False
+        self.window = (first, last)
+        chunks = {}
+        for index in range(first, last + 1):
+            chunks[index] = self.chunks.get(index) or self.load_chunk(index)
+        self.chunks = chunks
+        self.platforms = [p for index in sorted(chunks) for p in chunks[index][0]]
+        self.enemies = [e for index in sorted(chunks) for e in chunks[index][1]]
+        self.coins = [c for index in sorted(chunks) for c in chunks[index][2]]
+        self.platform_index = PlatformIndex(self.platforms)
+        return True
+
+    def remove_enemy(self, enemy):
+        self.removed.add(enemy.key)
+        self.enemies.remove(enemy)
+        self.chunks[enemy.key[1]][1].remove(enemy)
+
+    def collect_coin(self, coin):
+        coin.collected = True
+        self.removed.add(coin.key)
+
+# 静态场景的区块渲染: 天空、地面、平台和金币按关卡区块预先合成到区块大小的 Surface 上并缓存,
+# 每帧只需把可见区块贴到画面上; 区块内容变化 (金币被收集) 时只重新合成受影响的区块。
+# 平台宽度不超过一个区块, 所以合成区块 k 时只需再画区块 k-1 中伸过来的平台 (金币半径很小, 左右各看一个区块)。
+class ChunkRenderer:
+    def __init__(self, world):
+        self.world = world
+        self.surfaces = {}
+
+    def reset(self):
+        self.surfaces.clear()
+
+    def invalidate(self, rect):
+        # 丢弃与 rect (关卡坐标) 相交的区块缓存
+        chunk_width = self.world.level.chunk_width
+        for index in range(rect.left // chunk_width, (rect.right - 1) // chunk_width + 1):
+            self.surfaces.pop(index, None)
+
+    def compose(self, index):
+        chunk_width = self.world.level.chunk_width
+        left = index * chunk_width
+        surface = pygame.Surface((chunk_width, SCREEN_HEIGHT))
+        surface.fill(BLUE)
+        pygame.draw.rect(surface, GREEN, (0, SCREEN_HEIGHT - GROUND_HEIGHT, chunk_width, GROUND_HEIGHT))
+        chunks = self.world.chunks
+        for i in (index - 1, index):
+            if i in chunks:
+                for platform in chunks[i][0]:
+                    platform.draw(surface, left)
+        for i in (index - 1, index, index + 1):
+            if i in chunks:
+                for coin in chunks[i][2]:
+                    coin.draw(surface, left)
+        return optimize(surface)
+
+    def draw(self, target, camera_x):
+        # 把可见区块贴到 target 上; 已经移出载入窗口的区块缓存一并丢弃
+        chunk_width = self.world.level.chunk_width
+        surfaces = self.surfaces
+        for index in [index for index in surfaces if index not in self.world.chunks]:
+            del surfaces[index]
+        first = camera_x // chunk_width
+        last = min((camera_x + SCREEN_WIDTH - 1) // chunk_width, len(self.world.level) - 1)
+        for index in range(first, last + 1):
+            surface = surfaces.get(index)
+            if surface is None:
+                surface = surfaces[index] = self.compose(index)
+            target.blit(surface, (index * chunk_width - camera_x, 0))
 
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("马里奥风格小游戏")
-        self.clock = pygame.time.Clock()
+    def __init__(self, dirty_rects=False, level=None):
+        self.screen = open_window((SCREEN_WIDTH, SCREEN_HEIGHT), "马里奥风格小游戏")
         
         # 创建游戏对象
         self.player = Player(50, SCREEN_HEIGHT - GROUND_HEIGHT - 50)
         
-        # 创建平台
-        self.platforms = [
-            Platform(200, SCREEN_HEIGHT - 200, 150, 20),
-            Platform(400, SCREEN_HEIGHT - 300, 150, 20),
-            Platform(600, SCREEN_HEIGHT - 250, 150, 20),
-            Platform(150, SCREEN_HEIGHT - 400, 100, 20),
-            Platform(500, SCREEN_HEIGHT - 450, 120, 20),
-        ]
+        # 关卡按区块流式载入, 平台、敌人和金币只包含相机附近的部分
+        self.world = World(level if level is not None else default_level())
+        self.camera_x = 0
+        self.update_camera()
+        self.prev_camera_x = self.camera_x
+        
+        self.score = 0
+        self.font = get_font(36)
         
-        # 创建敌人
-        self.enemies = [
-            Enemy(300, SCREEN_HEIGHT - GROUND_HEIGHT - 25, 1),
-            Enemy(500, SCREEN_HEIGHT - 320, 2),
-            Enemy(650, SCREEN_HEIGHT - 270, 1.5),
-        ]
+        # 背景 = 可见区块的静态场景 + 操作说明, 只在相机移动或区块变化后重新拼合
+        self.renderer = ChunkRenderer(self.world)
+        self.background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        self.help_text = get_font(24).render(
+            "方向键/WASD移动, 空格/W/↑跳跃", True, BLACK)
+        self.background_x = None
         
-        # 创建金币
-        self.coins = [
-            Coin(275, SCREEN_HEIGHT - 230),
-            Coin(475, SCREEN_HEIGHT - 330),
-            Coin(675, SCREEN_HEIGHT - 280),
-            Coin(200, SCREEN_HEIGHT - 430),
-            Coin(560, SCREEN_HEIGHT - 480),
-        ]
+        # 可选的脏矩形渲染 (只提交变化的区域)
+        self.dirty = DirtyRects() if dirty_rects else None
         
-        self.score = 0
-        self.font = pygame.font.Font(None, 36)
+    def update_camera(self):
+        # 相机水平跟随玩家, 不超出关卡范围; 返回相机是否移动或区块是否变化
+        max_x = max(self.world.width - SCREEN_WIDTH, 0)
+        camera_x = min(max(int(self.player.x) - CAMERA_LEAD, 0), max_x)
+        moved = camera_x != self.camera_x
+        self.camera_x = camera_x
+        streamed = self.world.stream(camera_x)
+        return moved or streamed
         
     def handle_collisions(self):
         # 玩家与敌人碰撞
-        for enemy in self.enemies:
+        for enemy in self.world.enemies:
             if self.player.rect.colliderect(enemy.rect):
                 # 如果玩家从上方踩到敌人
                 if (self.player.vel_y > 0 and 
                     self.player.rect.bottom - 10 < enemy.rect.top):
-                    self.enemies.remove(enemy)
+                    self.world.remove_enemy(enemy)
                     self.player.vel_y = -8  # 小跳跃效果
                     self.score += 100
                 else:
@@ -224,82 +419,147 @@ class Game:
                     self.reset_game()
                     
         # 玩家与金币碰撞
-        for coin in self.coins:
+        for coin in self.world.coins:
             if not coin.collected and self.player.rect.colliderect(coin.rect):
-                coin.collected = True
+                self.world.collect_coin(coin)
+                self.renderer.invalidate(coin.rect)
+                self.background_x = None
                 self.score += 50
+                if self.dirty:
+                    self.dirty.invalidate(coin.rect.move(-self.camera_x, 0))
                 
     def reset_game(self):
         self.player = Player(50, SCREEN_HEIGHT - GROUND_HEIGHT - 50)
-        self.enemies = [
-            Enemy(300, SCREEN_HEIGHT - GROUND_HEIGHT - 25, 1),
-            Enemy(500, SCREEN_HEIGHT - 320, 2),
-            Enemy(650, SCREEN_HEIGHT - 270, 1.5),
-        ]
-        for coin in self.coins:
-            coin.collected = False
+        self.world.reset()
+        self.renderer.reset()
+        self.background_x = None
+        self.update_camera()
+        self.prev_camera_x = self.camera_x
         self.score = 0
+        if self.dirty:
+            self.dirty.invalidate()
         
-    def draw(self):
-        # 绘制天空背景
-        self.screen.fill(BLUE)
+    def draw(self, alpha=1.0):
+        # alpha 为渲染插值系数 (见 game_loop), 相机和实体都画在两个逻辑帧之间的位置
+        dirty = self.dirty
+        camera_x = round(self.prev_camera_x + (self.camera_x - self.prev_camera_x) * alpha)
         
-        # 绘制地面
-        pygame.draw.rect(self.screen, GREEN, 
-                        (0, SCREEN_HEIGHT - GROUND_HEIGHT, SCREEN_WIDTH, GROUND_HEIGHT))
+        # 拼合背景: 天空、地面、平台和金币来自缓存的区块; 相机滚动时整屏都变了
+        if self.background_x != camera_x:
+            self.renderer.draw(self.background, camera_x)
+            self.background.blit(self.help_text, (10, SCREEN_HEIGHT - 30))
+            self.background_x = camera_x
+            if dirty:
+                dirty.invalidate()
+        
+        # 绘制背景
+        if dirty:
+            dirty.restore(self.screen, self.background)
+        else:
+            self.screen.blit(self.background, (0, 0))
         
-        # 绘制平台
-        for platform in self.platforms:
-            platform.draw(self.screen)
-            
-        # 绘制金币
-        for coin in self.coins:
-            coin.draw(self.screen)
-            
         # 绘制敌人
-        for enemy in self.enemies:
-            enemy.draw(self.screen)
+        enemy_rects = [enemy.draw(self.screen, camera_x, alpha) for enemy in self.world.enemies]
             
         # 绘制玩家
-        self.player.draw(self.screen)
+        player_rect = self.player.draw(self.screen, camera_x, alpha)
         
         # 绘制分数
         score_text = self.font.render(f"分数: {self.score}", True, BLACK)
-        self.screen.blit(score_text, (10, 10))
+        score_rect = self.screen.blit(score_text, (10, 10))
         
-        # 绘制操作说明
-        help_text = pygame.font.Font(None, 24).render(
-            "方向键/WASD移动, 空格/W/↑跳跃", True, BLACK)
-        self.screen.blit(help_text, (10, SCREEN_HEIGHT - 30))
+        # 帧分析覆盖层 (F3)
+        profiler_rect = profiler.draw_overlay(self.screen)
         
-        pygame.display.flip()
+        if dirty:
+            dirty.add_all(enemy_rects)
+            dirty.add(player_rect)
+            dirty.add(score_rect)
+            dirty.add(profiler_rect)
+            dirty.present()
+        else:
+            pygame.display.flip()
         
-    def run(self):
-        running = True
-        while running:
+    def tick(self, left, right, jump, reset=False):
+        # 一个逻辑帧; 录制和回放都以它为单位
+        if reset:
+            self.reset_game()
+        self.prev_camera_x = self.camera_x
+            
+        # 更新游戏对象 (只有已载入区块中的敌人)
+        self.player.update(self.world, Controls(left, right, jump))
+        for enemy in self.world.enemies:
+            enemy.update(self.world)
+            
+        # 处理碰撞
+        with profiler.scope("collisions"):
+            self.handle_collisions()
+        
+        # 相机跟随玩家, 绘制时在新旧位置之间插值
+        self.update_camera()
+        
+    def state_hash(self):
+        player = self.player
+        return state_digest(
+            (player.x, player.y, player.vel_x, player.vel_y, player.on_ground),
+            self.score, self.camera_x, sorted(self.world.removed),
+            [(enemy.key, enemy.x, enemy.direction) for enemy in self.world.enemies])
+        
+    def run(self, recorder=None):
+        # 固定步长循环: 逻辑帧率为 FPS, 物理与渲染帧率无关;
+        # recorder 不为 None 时逐个逻辑帧录制输入, 退出时写入最终状态哈希
+        loop = FixedStepLoop(FPS)
+        reset = False
+        
+        def handle_events():
+            nonlocal reset
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    running = False
+                    loop.stop()
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_r:  # R键重置游戏
-                        self.reset_game()
+                        reset = True
+                    elif event.key == pygame.K_F3:
+                        profiler.toggle_overlay()
                         
-            # 更新游戏对象
-            self.player.update(self.platforms)
-            for enemy in self.enemies:
-                enemy.update(self.platforms)
-                
-            # 处理碰撞
-            self.handle_collisions()
-            
-            # 绘制所有内容
-            self.draw()
+        def update():
+            # 重置只作用于事件之后的第一个逻辑帧
+            nonlocal reset
+            values = read_controls() + (reset,)
+            reset = False
+            if recorder:
+                recorder.record(*values)
+            self.tick(*values)
             
-            self.clock.tick(FPS)
+        loop.run(handle_events, update, self.draw)
             
+        if recorder:
+            recorder.close(self.state_hash())
+        profiler.close()
         pygame.quit()
         sys.exit()
 
+def load_level(options):
+    # 按启动选项载入关卡: level 为二进制关卡文件, random_level 为随机关卡的区块数
+    if options.get("level"):
+        return MappedLevel(options["level"])
+    if options.get("random_level"):
+        return generate_level(options["random_level"], seed=options["seed"])
+    return None
+
+def make_replay(log):
+    # 回放用的游戏对象 (回放时使用虚拟显示驱动, 不会出现窗口)
+    return Game(level=load_level(log.header))
+
 if __name__ == "__main__":
-    game = Game()
-    game.run()
\ No newline at end of file
+    # --level 文件: 载入二进制关卡; --random-level N: 随机生成 N 个区块的长关卡
+    # --seed N 固定随机种子, --record 文件 录制本局输入 (用 replay.py 回放)
+    # --profile 文件 导出每帧的分阶段耗时 (.csv 或 JSON lines), F3 显示帧时间直方图
+    start_profiling()
+    options = {"seed": session_seed(), "level": None, "random_level": None}
+    if "--level" in sys.argv:
+        options["level"] = os.path.abspath(sys.argv[sys.argv.index("--level") + 1])
+    elif "--random-level" in sys.argv:
+        options["random_level"] = int(sys.argv[sys.argv.index("--random-level") + 1])
+    game = Game(dirty_rects="--dirty-rects" in sys.argv, level=load_level(options))
+    game.run(open_recorder("mario", options.pop("seed"), RECORD_FORMAT, **options))
\ No newline at end of file
@@ -0,0 +1,192 @@
+import mmap
+import random
+import struct
+import sys
+from collections import namedtuple
+
+# 马里奥关卡数据: 关卡按固定宽度切成区块, 每个区块保存落在其中的平台、敌人和金币 (关卡坐标)。
+# 平台按左边缘、敌人和金币按 x 坐标归入区块; 平台宽度不超过一个区块,
+# 所以只要多载入相机左侧的一个区块, 伸进画面的平台就不会缺失。
+# 本模块只处理数据 (不依赖 pygame), 实体对象由 mario_game 在区块载入时创建。
+#
+# 二进制关卡文件 (小端序):
+#   文件头    魔数 b"MLVL", 版本, 区块宽度, 关卡宽度, 区块数
+#   区块表    每个区块一条: 平台/敌人/金币记录的起始序号和数量
+#   记录区    平台 (x, y, 宽, 高)、敌人 (x, y, 速度)、金币 (x, y) 三段定长记录, 按区块顺序排列
+# MappedLevel 用 mmap 打开文件, 只有载入区块时才解析该区块的记录, 启动时间和内存与关卡长度无关。
+
+CHUNK_WIDTH = 400
+
+LEVEL_MAGIC = b"MLVL"
+LEVEL_VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+CHUNK_ENTRY = struct.Struct("<IIIHHH2x")
+PLATFORM_RECORD = struct.Struct("<ihHH")
+ENEMY_RECORD = struct.Struct("<ihf")
+COIN_RECORD = struct.Struct("<ih")
+
+# 平台 (x, y, 宽, 高), 敌人 (x, y, 速度), 金币 (中心 x, 中心 y)
+Chunk = namedtuple("Chunk", ["platforms", "enemies", "coins"])
+
+
+class Level:
+    def __init__(self, width, chunks, chunk_width=CHUNK_WIDTH):
+        self.width = width
+        self.chunks = chunks
+        self.chunk_width = chunk_width
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def chunk(self, index):
+        return self.chunks[index]
+
+    @classmethod
+    def from_entities(cls, platforms, enemies, coins, width=None, chunk_width=CHUNK_WIDTH):
+        # 把整关的实体列表按 x 坐标切分成区块, 区块内保持原来的顺序
+        if width is None:
+            right = max([x + w for x, _, w, _ in platforms] +
+                        [x for x, _, _ in enemies] + [x for x, _ in coins] + [0])
+            width = max(right, chunk_width)
+        count = max(1, -(-width // chunk_width))
+        chunks = [Chunk([], [], []) for _ in range(count)]
+
+        def slot(x):
+            return min(max(int(x) // chunk_width, 0), count - 1)
+
+        for platform in platforms:
+            if platform[2] > chunk_width:
+                raise ValueError(f"平台宽度 {platform[2]} 超过区块宽度 {chunk_width}")
+            chunks[slot(platform[0])].platforms.append(tuple(platform))
+        for enemy in enemies:
+            chunks[slot(enemy[0])].enemies.append(tuple(enemy))
+        for coin in coins:
+            chunks[slot(coin[0])].coins.append(tuple(coin))
+        return cls(width, chunks, chunk_width)
+
+
+def save_level(level, path):
+    # 把关卡写成二进制文件
+    chunks = [level.chunk(i) for i in range(len(level))]
+    table = []
+    platforms = []
+    enemies = []
+    coins = []
+    for chunk in chunks:
+        table.append(CHUNK_ENTRY.pack(len(platforms), len(enemies), len(coins),
+                                      len(chunk.platforms), len(chunk.enemies), len(chunk.coins)))
+        platforms.extend(PLATFORM_RECORD.pack(*record) for record in chunk.platforms)
+        enemies.extend(ENEMY_RECORD.pack(*record) for record in chunk.enemies)
+        coins.extend(COIN_RECORD.pack(*record) for record in chunk.coins)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, level.chunk_width, level.width, len(chunks)))
+        for part in (table, platforms, enemies, coins):
+            f.write(b"".join(part))
+
+
+class MappedLevel:
+    # 与 Level 接口相同, 数据直接从内存映射的文件中按需读取
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.chunk_width, self.width, self.count = HEADER.unpack_from(self.data)
+        if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+            self.data.close()
+            raise ValueError(f"{path} 不是版本 {LEVEL_VERSION} 的关卡文件")
+        self.table_offset = HEADER.size
+        self.platform_offset = self.table_offset + CHUNK_ENTRY.size * self.count
+        # 记录总数由最后一个区块的起始序号加数量得到
+        totals = (0, 0, 0)
+        if self.count:
+            last = self.table_offset + CHUNK_ENTRY.size * (self.count - 1)
+            entry = CHUNK_ENTRY.unpack_from(self.data, last)
+            totals = (entry[0] + entry[3], entry[1] + entry[4], entry[2] + entry[5])
+        self.enemy_offset = self.platform_offset + PLATFORM_RECORD.size * totals[0]
+        self.coin_offset = self.enemy_offset + ENEMY_RECORD.size * totals[1]
+
+    def __len__(self):
+        return self.count
+
+    def chunk(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        first_platform, first_enemy, first_coin, platforms, enemies, coins = \
+            CHUNK_ENTRY.unpack_from(self.data, self.table_offset + CHUNK_ENTRY.size * index)
+        return Chunk(
+            self._records(PLATFORM_RECORD, self.platform_offset, first_platform, platforms),
+            self._records(ENEMY_RECORD, self.enemy_offset, first_enemy, enemies),
+            self._records(COIN_RECORD, self.coin_offset, first_coin, coins),
+        )
+
+    def _records(self, record, base, first, count):
+        start = base + record.size * first
+        return list(record.iter_unpack(self.data[start:start + record.size * count]))
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 原来写死在 Game 里的单屏关卡 (800x600, 地面高 100)
+DEFAULT_PLATFORMS = [
+    (200, 400, 150, 20),
+    (400, 300, 150, 20),
+    (600, 350, 150, 20),
+    (150, 200, 100, 20),
+    (500, 150, 120, 20),
+]
+DEFAULT_ENEMIES = [
+    (300, 475, 1),
+    (500, 280, 2),
+    (650, 330, 1.5),
+]
+DEFAULT_COINS = [
+    (275, 370),
+    (475, 270),
+    (675, 320),
+    (200, 170),
+    (560, 120),
+]
+
+
+def default_level():
+    return Level.from_entities(DEFAULT_PLATFORMS, DEFAULT_ENEMIES, DEFAULT_COINS, width=800)
+
+
+def generate_level(num_chunks, platforms_per_chunk=4, seed=None, chunk_width=CHUNK_WIDTH,
+                   ground_y=500):
+    # 随机生成一个长关卡, 用于测试和压力测试: 每个区块若干平台, 部分平台上站着敌人、上方放金币
+    rng = random.Random(seed)
+    platforms = []
+    enemies = []
+    coins = []
+    for i in range(num_chunks):
+        left = i * chunk_width
+        for _ in range(platforms_per_chunk):
+            width = rng.randrange(60, 200)
+            x = left + rng.randrange(0, chunk_width - width)
+            y = rng.randrange(ground_y - 400, ground_y - 60, 10)
+            platforms.append((x, y, width, 20))
+            if rng.random() < 0.3:
+                enemies.append((x + width // 2, y - 25, rng.choice((1, 1.5, 2))))
+            if rng.random() < 0.5:
+                coins.append((x + width // 2, y - 30))
+    return Level.from_entities(platforms, enemies, coins, width=num_chunks * chunk_width,
+                               chunk_width=chunk_width)
+
+
+if __name__ == "__main__":
+    # 关卡转换: python mario_level.py 输出文件 [随机区块数]
+    # 只给输出文件时转换默认关卡, 给出区块数时生成随机长关卡
+    path = sys.argv[1]
+    if len(sys.argv) > 2:
+        level = generate_level(int(sys.argv[2]), seed=0)
+    else:
+        level = default_level()
+    save_level(level, path)
+    print(f"{path}: {len(level)} 个区块, 宽度 {level.width}")
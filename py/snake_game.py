@@ -1,9 +1,18 @@
+import os
 import pygame
 import random
 import sys
-
-# 初始化Pygame
-pygame.init()
+from collections import Counter, deque
+
+# 共享模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from free_cells import FreeCells
+from frame_profiler import profiler, start_profiling
+from game_loop import FixedStepLoop
+from render_cache import get_font, optimize
+from replay import open_recorder, session_seed, state_digest
+from snake_autopilot import Autopilot
+from window import open_window
 
 # 定义颜色
 WHITE = (255, 255, 255)
@@ -16,18 +25,46 @@ BLUE = (0, 0, 255)
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
 BLOCK_SIZE = 20
-GAME_SPEED = 15
-
-# 创建游戏窗口
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption('炫彩贪吃蛇')
-clock = pygame.time.Clock()
-
+GAME_SPEED = 15  # 逻辑帧率 (每秒移动的格数), 渲染帧率见 game_loop
+
+# 渐变色 255 - (i * 5) % 255 每 51 节循环一次
+GRADIENT_STEPS = 255 // 5
+
+def all_cells():
+    return ((x, y) for y in range(0, WINDOW_HEIGHT, BLOCK_SIZE)
+            for x in range(0, WINDOW_WIDTH, BLOCK_SIZE))
+
+# 背景和网格只绘制一次, 每帧整张贴图
+def build_background():
+    background = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+    background.fill(BLACK)
+    for x in range(0, WINDOW_WIDTH, BLOCK_SIZE):
+        pygame.draw.line(background, (40, 40, 40), (x, 0), (x, WINDOW_HEIGHT))
+    for y in range(0, WINDOW_HEIGHT, BLOCK_SIZE):
+        pygame.draw.line(background, (40, 40, 40), (0, y), (WINDOW_WIDTH, y))
+    return optimize(background)
+
+# 每一级渐变色预先做成一块蛇身贴图
+def build_segment_tiles():
+    tiles = []
+    for i in range(GRADIENT_STEPS):
+        tile = pygame.Surface((BLOCK_SIZE-2, BLOCK_SIZE-2))
+        tile.fill((0, 255 - (i * 5) % 255, 0))
+        tiles.append(optimize(tile))
+    return tiles
+
+# 蛇身用双端队列保存, 另用计数表记录每个格子被几节蛇身占用,
+# 头部进、尾部出时增量更新, 移动和自身碰撞检测都是常数时间;
+# free 是与之互补的空闲格子索引, 用于 O(1) 生成食物
 class Snake:
-    def __init__(self):
+    def __init__(self, rng=random):
+        self.rng = rng
         self.length = 1
-        self.positions = [(WINDOW_WIDTH//2, WINDOW_HEIGHT//2)]
-        self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
+        self.positions = deque([(WINDOW_WIDTH//2, WINDOW_HEIGHT//2)])
+        self.occupied = Counter(self.positions)
+        self.free = FreeCells(all_cells())
+        self.free.occupy(self.positions[0])
+        self.direction = rng.choice([UP, DOWN, LEFT, RIGHT])
         self.color = GREEN
         self.score = 0
 
@@ -38,36 +75,51 @@ class Snake:
         cur = self.get_head_position()
         x, y = self.direction
         new = ((cur[0] + (x*BLOCK_SIZE)) % WINDOW_WIDTH, (cur[1] + (y*BLOCK_SIZE)) % WINDOW_HEIGHT)
-        if new in self.positions[3:]:
+        # 与前三节以外的蛇身重合即撞到自己
+        positions = self.positions
+        near = sum(1 for i in range(min(3, len(positions))) if positions[i] == new)
+        if self.occupied[new] > near:
             return False
         else:
-            self.positions.insert(0, new)
-            if len(self.positions) > self.length:
-                self.positions.pop()
+            positions.appendleft(new)
+            self.occupied[new] += 1
+            self.free.occupy(new)
+            if len(positions) > self.length:
+                tail = positions.pop()
+                self.occupied[tail] -= 1
+                if not self.occupied[tail]:
+                    del self.occupied[tail]
+                    self.free.release(tail)
             return True
 
     def reset(self):
         self.length = 1
-        self.positions = [(WINDOW_WIDTH//2, WINDOW_HEIGHT//2)]
-        self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
+        self.positions = deque([(WINDOW_WIDTH//2, WINDOW_HEIGHT//2)])
+        self.occupied = Counter(self.positions)
+        self.free = FreeCells(all_cells())
+        self.free.occupy(self.positions[0])
+        self.direction = self.rng.choice([UP, DOWN, LEFT, RIGHT])
         self.score = 0
 
-    def render(self):
-        for i, p in enumerate(self.positions):
-            color = (0, 255 - (i * 5) % 255, 0)  # 渐变色效果
-            pygame.draw.rect(screen, color, pygame.Rect(p[0], p[1], BLOCK_SIZE-2, BLOCK_SIZE-2))
+    def render(self, screen, tiles):
+        # 按渐变级别取贴图, 一次 blits 调用画完整条蛇
+        steps = len(tiles)
+        screen.blits([(tiles[i % steps], p) for i, p in enumerate(self.positions)], False)
 
 class Food:
-    def __init__(self):
+    def __init__(self, free_cells, rng=random):
         self.position = (0, 0)
         self.color = RED
-        self.randomize_position()
+        self.rng = rng
+        self.randomize_position(free_cells)
 
-    def randomize_position(self):
-        self.position = (random.randint(0, (WINDOW_WIDTH-BLOCK_SIZE)//BLOCK_SIZE) * BLOCK_SIZE,
-                        random.randint(0, (WINDOW_HEIGHT-BLOCK_SIZE)//BLOCK_SIZE) * BLOCK_SIZE)
+    def randomize_position(self, free_cells):
+        # 只在蛇身以外的空闲格子中均匀抽取, 没有空位时 position 为 None
+        self.position = free_cells.sample(self.rng)
 
-    def render(self):
+    def render(self, screen):
+        if self.position is None:
+            return
         pygame.draw.rect(screen, self.color, pygame.Rect(self.position[0], self.position[1], BLOCK_SIZE-2, BLOCK_SIZE-2))
 
 # 定义方向
@@ -76,16 +128,91 @@ DOWN = (0, 1)
 LEFT = (-1, 0)
 RIGHT = (1, 0)
 
-def main():
-    snake = Snake()
-    food = Food()
-    font = pygame.font.Font(None, 36)
+# 录像中方向记为在 DIRECTIONS 中的序号
+DIRECTIONS = (UP, DOWN, LEFT, RIGHT)
+RECORD_FORMAT = '<B'
+
+# 一局游戏的逻辑状态, 所有随机数都来自带种子的 rng, 同样的种子和方向序列得到同样的结果
+class Game:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.snake = Snake(self.rng)
+        self.food = Food(self.snake.free, self.rng)
+
+    def tick(self, direction):
+        snake = self.snake
+        food = self.food
+        snake.direction = DIRECTIONS[direction]
+
+        # 更新蛇的位置
+        if not snake.update():
+            snake.reset()
+            food.randomize_position(snake.free)
+
+        # 检查是否吃到食物
+        if snake.get_head_position() == food.position:
+            snake.length += 1
+            snake.score += 10
+            food.randomize_position(snake.free)
+            if food.position is None:
+                # 蛇占满了整个棋盘: 胜利, 重新开始
+                snake.reset()
+                food.randomize_position(snake.free)
+
+    def state_hash(self):
+        snake = self.snake
+        return state_digest(list(snake.positions), snake.direction, snake.length, snake.score,
+                            self.food.position)
 
-    while True:
+# 绘制一帧并提交到屏幕
+def draw(screen, game, background, tiles, font):
+    # 绘制背景和网格
+    screen.blit(background, (0, 0))
+
+    # 绘制蛇和食物
+    game.snake.render(screen, tiles)
+    game.food.render(screen)
+
+    # 显示分数
+    score_text = font.render(f'分数: {game.snake.score}', True, WHITE)
+    screen.blit(score_text, (10, 10))
+
+    # 帧分析覆盖层 (F3)
+    profiler.draw_overlay(screen)
+
+    pygame.display.update()
+
+# replay.py 回放时创建无界面的游戏
+def make_replay(log):
+    return Game(log.seed)
+
+def main():
+    # --seed N 固定随机种子, --record 文件 录制本局输入
+    # --profile 文件 导出每帧的分阶段耗时 (.csv 或 JSON lines), F3 显示帧时间直方图
+    seed = session_seed()
+    start_profiling()
+    game = Game(seed)
+    snake = game.snake
+    food = game.food
+    recorder = open_recorder('snake', seed, RECORD_FORMAT)
+    # 创建游戏窗口 (导入本模块不会打开窗口)
+    screen = open_window((WINDOW_WIDTH, WINDOW_HEIGHT), '炫彩贪吃蛇')
+    font = get_font(36)
+    background = build_background()
+    tiles = build_segment_tiles()
+    # --autopilot: 由寻路自动驾驶控制方向 (穿墙规则, 像素坐标)
+    pilot = None
+    if '--autopilot' in sys.argv:
+        pilot = Autopilot(WINDOW_WIDTH // BLOCK_SIZE, WINDOW_HEIGHT // BLOCK_SIZE,
+                          cell_size=BLOCK_SIZE, wrap=True, tail_passable=False)
+
+    # 固定步长循环: 蛇每秒移动 GAME_SPEED 格, 渲染帧率与之无关
+    loop = FixedStepLoop(GAME_SPEED)
+
+    def handle_events():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                loop.stop()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_UP and snake.direction != DOWN:
                     snake.direction = UP
@@ -95,37 +222,30 @@ def main():
                     snake.direction = LEFT
                 elif event.key == pygame.K_RIGHT and snake.direction != LEFT:
                     snake.direction = RIGHT
-
-        # 更新蛇的位置
-        if not snake.update():
-            snake.reset()
-            food.randomize_position()
-
-        # 检查是否吃到食物
-        if snake.get_head_position() == food.position:
-            snake.length += 1
-            snake.score += 10
-            food.randomize_position()
-
-        # 绘制背景
-        screen.fill(BLACK)
-        
-        # 绘制网格
-        for x in range(0, WINDOW_WIDTH, BLOCK_SIZE):
-            pygame.draw.line(screen, (40, 40, 40), (x, 0), (x, WINDOW_HEIGHT))
-        for y in range(0, WINDOW_HEIGHT, BLOCK_SIZE):
-            pygame.draw.line(screen, (40, 40, 40), (0, y), (WINDOW_WIDTH, y))
-
-        # 绘制蛇和食物
-        snake.render()
-        food.render()
-
-        # 显示分数
-        score_text = font.render(f'分数: {snake.score}', True, WHITE)
-        screen.blit(score_text, (10, 10))
-
-        pygame.display.update()
-        clock.tick(GAME_SPEED)
+                elif event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+
+    def update():
+        if pilot is not None:
+            step = pilot.choose(snake.positions, snake.occupied, food.position,
+                                snake.length > len(snake.positions))
+            if step is not None and step != (-snake.direction[0], -snake.direction[1]):
+                snake.direction = step
+
+        # 移动蛇, 检查食物
+        direction = DIRECTIONS.index(snake.direction)
+        if recorder:
+            recorder.record(direction)
+        game.tick(direction)
+
+    # 蛇按格移动, 绘制时不插值
+    loop.run(handle_events, update, lambda alpha: draw(screen, game, background, tiles, font))
+
+    if recorder:
+        recorder.close(game.state_hash())
+    profiler.close()
+    pygame.quit()
+    sys.exit()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
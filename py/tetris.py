@@ -1,8 +1,19 @@
+import os
+import sys
 import pygame
 import random
 
-# 初始化pygame
-pygame.init()
+# 共享模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dirty_rects import DirtyRects
+from frame_profiler import profiler, start_profiling
+from game_loop import FixedStepLoop
+from tetris_board import (GRID_WIDTH, GRID_HEIGHT, SHAPES, ROTATIONS, WALL_KICKS,
+                          BitBoard, spawn_x)
+from tetris_ai import TetrisAI
+from render_cache import get_font
+from replay import open_recorder, session_seed, state_digest
+from window import open_window
 
 # 颜色定义
 BLACK = (0, 0, 0)
@@ -17,76 +28,102 @@ ORANGE = (255, 165, 0)
 
 # 游戏设置
 BLOCK_SIZE = 30
-GRID_WIDTH = 10
-GRID_HEIGHT = 20
 SCREEN_WIDTH = BLOCK_SIZE * (GRID_WIDTH + 6)
 SCREEN_HEIGHT = BLOCK_SIZE * GRID_HEIGHT
+FPS = 60  # 逻辑帧率, 渲染帧率见 game_loop
+FRAME_MS = 1000 / FPS  # 每个逻辑帧推进的模拟时间, 下落计时不依赖墙钟
 
-# 方块形状定义
-SHAPES = [
-    [[1, 1, 1, 1]],  # I
-    [[1, 1], [1, 1]],  # O
-    [[1, 1, 1], [0, 1, 0]],  # T
-    [[1, 1, 1], [1, 0, 0]],  # L
-    [[1, 1, 1], [0, 0, 1]],  # J
-    [[1, 1, 0], [0, 1, 1]],  # S
-    [[0, 1, 1], [1, 1, 0]]   # Z
-]
+# 录像中每帧的输入记录: 本帧是否按下 左、右、下、旋转
+RECORD_FORMAT = "<????"
 
+# 方块形状定义见 tetris_board.SHAPES
 COLORS = [CYAN, YELLOW, MAGENTA, ORANGE, BLUE, GREEN, RED]
 
+# 方块序列来自以 seed 初始化的随机数生成器, 同样的种子和输入总是得到同样的一局
 class Tetris:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("俄罗斯方块")
-        self.clock = pygame.time.Clock()
-        self.grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+    def __init__(self, dirty_rects=False, autoplay=False, seed=None):
+        self.screen = open_window((SCREEN_WIDTH, SCREEN_HEIGHT), "俄罗斯方块")
+        self.rng = random.Random(seed)
+        # 位棋盘负责碰撞和消行, 其颜色平面即 self.grid
+        self.board = BitBoard()
         self.current_piece = self.new_piece()
+        self.next_piece = self.new_piece()
         self.game_over = False
         self.score = 0
         self.fall_time = 0
         self.fall_speed = 500  # 初始下落速度（毫秒）
+        # 可选的脏矩形渲染: 平时只提交当前方块和分数区域, 方块落定后整屏刷新
+        self.dirty = DirtyRects() if dirty_rects else None
+        # 可选的自动玩家, 每个新方块出现时搜索一次落点
+        self.ai = TetrisAI() if autoplay else None
+        self.ai_planned = False
+
+    @property
+    def grid(self):
+        return self.board.colors
 
     def new_piece(self):
         # 随机选择一个方块和颜色
-        shape = random.randint(0, len(SHAPES) - 1)
+        shape = self.rng.randint(0, len(SHAPES) - 1)
         return {
+            'kind': shape,
+            'rotation': 0,
             'shape': SHAPES[shape],
             'color': COLORS[shape],
-            'x': GRID_WIDTH // 2 - len(SHAPES[shape][0]) // 2,
+            'x': spawn_x(shape),
             'y': 0
         }
 
     def valid_move(self, piece, x, y):
-        for i in range(len(piece['shape'])):
-            for j in range(len(piece['shape'][0])):
-                if piece['shape'][i][j]:
-                    new_x = x + j
-                    new_y = y + i
-                    if new_x < 0 or new_x >= GRID_WIDTH or new_y >= GRID_HEIGHT:
-                        return False
-                    if new_y >= 0 and self.grid[new_y][new_x]:
-                        return False
-        return True
+        return self.board.fits(ROTATIONS[piece['kind']][piece['rotation']].masks, x, y)
 
     def rotate_piece(self):
-        # 旋转当前方块
-        new_shape = list(zip(*self.current_piece['shape'][::-1]))
-        rotated_piece = self.current_piece.copy()
-        rotated_piece['shape'] = new_shape
-        if self.valid_move(rotated_piece, self.current_piece['x'], self.current_piece['y']):
-            self.current_piece = rotated_piece
+        # 旋转当前方块: 查预计算的旋转表, 原地放不下时按踢墙表依次尝试偏移
+        piece = self.current_piece
+        kind = piece['kind']
+        rotation = (piece['rotation'] + 1) % 4
+        masks = ROTATIONS[kind][rotation].masks
+        for dx, dy in WALL_KICKS[kind]:
+            if self.board.fits(masks, piece['x'] + dx, piece['y'] + dy):
+                piece['rotation'] = rotation
+                piece['shape'] = ROTATIONS[kind][rotation].shape
+                piece['x'] += dx
+                piece['y'] += dy
+                return
+
+    def lock_piece(self):
+        # 固定当前方块, 有格子超出顶部时游戏结束
+        piece = self.current_piece
+        masks = ROTATIONS[piece['kind']][piece['rotation']].masks
+        if not self.board.place(masks, piece['x'], piece['y'], piece['color']):
+            self.game_over = True
 
     def clear_lines(self):
-        lines_cleared = 0
-        for i in range(GRID_HEIGHT):
-            if all(self.grid[i]):
-                lines_cleared += 1
-                del self.grid[i]
-                self.grid.insert(0, [0 for _ in range(GRID_WIDTH)])
-        return lines_cleared
+        return self.board.clear_lines()
 
-    def draw(self):
+    def autoplay_step(self):
+        # 把当前方块旋转、平移到 AI 选出的落点并直接落到底, 由自动下落完成固定
+        if self.ai_planned:
+            return
+        self.ai_planned = True
+        piece = self.current_piece
+        move = self.ai.best_move(BitBoard.from_rows(self.board.rows), piece['kind'],
+                                 (self.next_piece['kind'],))
+        if move is None:
+            return
+        rotation, x = move
+        for _ in range(4):
+            if piece['rotation'] == rotation:
+                break
+            self.rotate_piece()
+        step = 1 if x > piece['x'] else -1
+        while piece['x'] != x and self.valid_move(piece, piece['x'] + step, piece['y']):
+            piece['x'] += step
+        while self.valid_move(piece, piece['x'], piece['y'] + 1):
+            piece['y'] += 1
+
+    def draw(self, alpha=1.0):
+        # 方块按格移动, 不需要渲染插值 (alpha 只是为了符合 game_loop 的接口)
         self.screen.fill(BLACK)
         
         # 绘制网格
@@ -99,79 +136,154 @@ class Tetris:
                                    (j * BLOCK_SIZE, i * BLOCK_SIZE, BLOCK_SIZE - 1, BLOCK_SIZE - 1))
 
         # 绘制当前方块
+        piece_rect = None
         if self.current_piece:
-            for i in range(len(self.current_piece['shape'])):
-                for j in range(len(self.current_piece['shape'][0])):
-                    if self.current_piece['shape'][i][j]:
-                        pygame.draw.rect(self.screen, self.current_piece['color'],
-                                       ((self.current_piece['x'] + j) * BLOCK_SIZE,
-                                        (self.current_piece['y'] + i) * BLOCK_SIZE,
-                                        BLOCK_SIZE - 1, BLOCK_SIZE - 1))
+            piece = self.current_piece
+            state = ROTATIONS[piece['kind']][piece['rotation']]
+            for j, i in state.cells:
+                pygame.draw.rect(self.screen, piece['color'],
+                               ((piece['x'] + j) * BLOCK_SIZE,
+                                (piece['y'] + i) * BLOCK_SIZE,
+                                BLOCK_SIZE - 1, BLOCK_SIZE - 1))
+            piece_rect = pygame.Rect(piece['x'] * BLOCK_SIZE, piece['y'] * BLOCK_SIZE,
+                                     state.width * BLOCK_SIZE, state.height * BLOCK_SIZE)
 
         # 绘制分数
-        font = pygame.font.Font(None, 36)
-        score_text = font.render(f'分数: {self.score}', True, WHITE)
-        self.screen.blit(score_text, (GRID_WIDTH * BLOCK_SIZE + 10, 10))
+        score_text = get_font(36).render(f'分数: {self.score}', True, WHITE)
+        score_rect = self.screen.blit(score_text, (GRID_WIDTH * BLOCK_SIZE + 10, 10))
 
-        pygame.display.flip()
+        # 绘制下一个方块
+        preview = self.next_piece
+        for j, i in ROTATIONS[preview['kind']][0].cells:
+            pygame.draw.rect(self.screen, preview['color'],
+                           (GRID_WIDTH * BLOCK_SIZE + 30 + j * BLOCK_SIZE,
+                            60 + i * BLOCK_SIZE, BLOCK_SIZE - 1, BLOCK_SIZE - 1))
+
+        # 帧分析覆盖层 (F3)
+        profiler_rect = profiler.draw_overlay(self.screen)
+
+        if self.dirty:
+            self.dirty.add(piece_rect)
+            self.dirty.add(score_rect)
+            self.dirty.add(profiler_rect)
+            self.dirty.present()
+        else:
+            pygame.display.flip()
+
+    def tick(self, left, right, down, rotate):
+        # 一个逻辑帧: 处理本帧的按键、自动玩家和自动下落; 录制和回放都以它为单位
+        self.fall_time += FRAME_MS
+        if left:
+            if self.valid_move(self.current_piece, self.current_piece['x'] - 1, self.current_piece['y']):
+                self.current_piece['x'] -= 1
+        if right:
+            if self.valid_move(self.current_piece, self.current_piece['x'] + 1, self.current_piece['y']):
+                self.current_piece['x'] += 1
+        if down:
+            if self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y'] + 1):
+                self.current_piece['y'] += 1
+        if rotate:
+            self.rotate_piece()
+
+        if self.ai:
+            self.autoplay_step()
 
-    def run(self):
-        while not self.game_over:
-            self.fall_time += self.clock.get_rawtime()
-            self.clock.tick()
+        # 自动下落
+        if self.fall_time >= self.fall_speed:
+            self.fall_time = 0
+            if self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y'] + 1):
+                self.current_piece['y'] += 1
+            else:
+                # 固定当前方块
+                self.lock_piece()
 
+                # 棋盘内容改变, 下一帧整屏刷新
+                if self.dirty:
+                    self.dirty.invalidate()
+
+                # 清除完整的行
+                lines = self.clear_lines()
+                self.score += lines * 100
+
+                # 生成新方块
+                self.current_piece = self.next_piece
+                self.next_piece = self.new_piece()
+                self.ai_planned = False
+                
+                # 检查游戏是否结束
+                if not self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y']):
+                    self.game_over = True
+
+    def state_hash(self):
+        piece = self.current_piece
+        return state_digest(
+            self.board.rows, self.grid, self.score, self.fall_time, self.game_over,
+            (piece['kind'], piece['rotation'], piece['x'], piece['y']), self.next_piece['kind'])
+
+    def run(self, recorder=None):
+        # 固定步长循环: 逻辑帧率为 FPS, 渲染帧率与之无关;
+        # recorder 不为 None 时逐个逻辑帧录制输入, 结束时写入最终状态哈希
+        loop = FixedStepLoop(FPS)
+        left = right = down = rotate = False
+        closed = False
+
+        def handle_events():
+            nonlocal left, right, down, rotate, closed
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    return
-                if event.type == pygame.KEYDOWN:
+                    closed = True
+                    loop.stop()
+                elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_LEFT:
-                        if self.valid_move(self.current_piece, self.current_piece['x'] - 1, self.current_piece['y']):
-                            self.current_piece['x'] -= 1
+                        left = True
                     elif event.key == pygame.K_RIGHT:
-                        if self.valid_move(self.current_piece, self.current_piece['x'] + 1, self.current_piece['y']):
-                            self.current_piece['x'] += 1
+                        right = True
                     elif event.key == pygame.K_DOWN:
-                        if self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y'] + 1):
-                            self.current_piece['y'] += 1
+                        down = True
                     elif event.key == pygame.K_UP:
-                        self.rotate_piece()
-
-            # 自动下落
-            if self.fall_time >= self.fall_speed:
-                self.fall_time = 0
-                if self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y'] + 1):
-                    self.current_piece['y'] += 1
-                else:
-                    # 固定当前方块
-                    for i in range(len(self.current_piece['shape'])):
-                        for j in range(len(self.current_piece['shape'][0])):
-                            if self.current_piece['shape'][i][j]:
-                                if self.current_piece['y'] + i < 0:
-                                    self.game_over = True
-                                    break
-                                self.grid[self.current_piece['y'] + i][self.current_piece['x'] + j] = self.current_piece['color']
-                    
-                    # 清除完整的行
-                    lines = self.clear_lines()
-                    self.score += lines * 100
-
-                    # 生成新方块
-                    self.current_piece = self.new_piece()
-                    
-                    # 检查游戏是否结束
-                    if not self.valid_move(self.current_piece, self.current_piece['x'], self.current_piece['y']):
-                        self.game_over = True
-
-            self.draw()
+                        rotate = True
+                    elif event.key == pygame.K_F3:
+                        profiler.toggle_overlay()
+
+        def update():
+            # 按键只作用于事件之后的第一个逻辑帧
+            nonlocal left, right, down, rotate
+            values = (left, right, down, rotate)
+            left = right = down = rotate = False
+            if recorder:
+                recorder.record(*values)
+            self.tick(*values)
+            if self.game_over:
+                loop.stop()
+
+        loop.run(handle_events, update, self.draw)
+
+        if recorder:
+            recorder.close(self.state_hash())
+        profiler.close()
+        if closed:
+            if self.ai:
+                self.ai.close()
+            return
 
         # 游戏结束显示
-        font = pygame.font.Font(None, 48)
-        game_over_text = font.render('游戏结束!', True, WHITE)
+        game_over_text = get_font(48).render('游戏结束!', True, WHITE)
         self.screen.blit(game_over_text, (SCREEN_WIDTH//2 - 100, SCREEN_HEIGHT//2))
         pygame.display.flip()
+        if self.ai:
+            self.ai.close()
         pygame.time.wait(2000)
 
+def make_replay(log):
+    # 回放用的游戏对象 (回放时使用虚拟显示驱动, 不会出现窗口)
+    return Tetris(autoplay=log.header.get('autoplay', False), seed=log.seed)
+
 if __name__ == '__main__':
-    game = Tetris()
-    game.run()
+    # --seed N 固定随机种子, --record 文件 录制本局输入 (用 replay.py 回放)
+    # --profile 文件 导出每帧的分阶段耗时 (.csv 或 JSON lines), F3 显示帧时间直方图
+    seed = session_seed()
+    start_profiling()
+    autoplay = '--autoplay' in sys.argv
+    game = Tetris(dirty_rects='--dirty-rects' in sys.argv, autoplay=autoplay, seed=seed)
+    game.run(open_recorder('tetris', seed, RECORD_FORMAT, autoplay=autoplay))
     pygame.quit()
\ No newline at end of file
@@ -0,0 +1,173 @@
+# 俄罗斯方块自动玩家: 枚举当前方块 (以及下一个方块) 的每个 (旋转, 列) 落点,
+# 用启发式评分 (空洞、总高度、凹凸度、消行数) 选出最优落点。
+# 搜索深度 >= 2 时, 当前方块的各个落点分发到进程池中并行评估。
+# 碰撞和消行直接复用 tetris_board.BitBoard, 与游戏本身的规则完全一致。
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from tetris_board import ROTATIONS, SHAPES, BitBoard, TetrisEngine
+
+# 启发式权重 (Yiyuan Lee 的经典参数)
+WEIGHTS = {
+    "height": -0.510066,
+    "lines": 0.760666,
+    "holes": -0.35663,
+    "bumpiness": -0.184483,
+}
+
+# 每种方块去重后的旋转下标 (O 只有 1 种, I/S/Z 只有 2 种)
+UNIQUE_ROTATIONS = []
+for _states in ROTATIONS:
+    _seen = {}
+    for _rotation, _state in enumerate(_states):
+        _seen.setdefault(tuple(map(tuple, _state.shape)), _rotation)
+    UNIQUE_ROTATIONS.append(tuple(sorted(_seen.values())))
+
+LOSS = float("-inf")
+
+
+def board_features(rows, width):
+    # 返回 (总高度, 空洞数, 凹凸度)
+    height = len(rows)
+    heights = [0] * width
+    holes = 0
+    seen = 0  # 已经遇到过方块的列
+    for y, row in enumerate(rows):
+        new = row & ~seen
+        if new:
+            for x in range(width):
+                if new >> x & 1:
+                    heights[x] = height - y
+            seen |= row
+        # 上方有方块而本格为空即为空洞
+        holes += bin(seen & ~row).count("1")
+    bumpiness = sum(abs(heights[i] - heights[i + 1]) for i in range(width - 1))
+    return sum(heights), holes, bumpiness
+
+
+def evaluate(rows, lines, width, weights=WEIGHTS):
+    height, holes, bumpiness = board_features(rows, width)
+    return (weights["height"] * height + weights["lines"] * lines +
+            weights["holes"] * holes + weights["bumpiness"] * bumpiness)
+
+
+def placements(board, kind):
+    # 枚举方块所有可达落点, 生成 (rotation, x, 落下并消行后的棋盘, 消行数)
+    for rotation in UNIQUE_ROTATIONS[kind]:
+        masks = ROTATIONS[kind][rotation].masks
+        for x in range(len(masks)):
+            y = board.drop_y(masks, x)
+            if y is None:
+                continue
+            after = board.copy()
+            if not after.place(masks, x, y):
+                continue
+            lines = after.clear_lines()
+            yield rotation, x, after, lines
+
+
+def search(board, kinds, depth, weights=WEIGHTS):
+    # 返回当前局面在给定深度下的最佳评分; kinds 为已知的后续方块,
+    # 深度超出已知方块时对 7 种方块取平均
+    if depth == 0:
+        return evaluate(board.rows, 0, board.width, weights)
+    if kinds:
+        return _best(board, kinds[0], kinds[1:], depth, weights)
+    total = 0.0
+    for kind in range(len(SHAPES)):
+        score = _best(board, kind, (), depth, weights)
+        if score == LOSS:
+            return LOSS
+        total += score
+    return total / len(SHAPES)
+
+
+def _best(board, kind, rest, depth, weights):
+    best = LOSS
+    for _, _, after, lines in placements(board, kind):
+        score = weights["lines"] * lines + _follow(after, rest, depth - 1, weights)
+        if score > best:
+            best = score
+    return best
+
+
+def _follow(board, kinds, depth, weights):
+    if depth == 0:
+        return evaluate(board.rows, 0, board.width, weights)
+    return search(board, kinds, depth, weights)
+
+
+def _evaluate_placement(args):
+    # 进程池任务: 评估当前方块的一个落点之后的局面
+    rows, width, lines, kinds, depth, weights = args
+    board = BitBoard.from_rows(rows, width)
+    return weights["lines"] * lines + _follow(board, kinds, depth, weights)
+
+
+class TetrisAI:
+    def __init__(self, depth=2, workers=None, weights=WEIGHTS):
+        self.depth = depth
+        self.weights = weights
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.pool = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def best_move(self, board, kind, next_kinds=()):
+        # 返回最佳落点 (rotation, x), 没有可行落点时返回 None
+        if not isinstance(board, BitBoard):
+            board = BitBoard.from_rows(board)
+        candidates = list(placements(board, kind))
+        if not candidates:
+            return None
+        depth = self.depth - 1
+        kinds = tuple(next_kinds)
+        if self.depth >= 2 and self.workers > 1:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.workers)
+            tasks = [(after.rows, after.width, lines, kinds, depth, self.weights)
+                     for _, _, after, lines in candidates]
+            chunk = max(1, len(tasks) // (self.workers * 4))
+            scores = list(self.pool.map(_evaluate_placement, tasks, chunksize=chunk))
+        else:
+            scores = [self.weights["lines"] * lines + _follow(after, kinds, depth, self.weights)
+                      for _, _, after, lines in candidates]
+        best = max(range(len(candidates)), key=scores.__getitem__)
+        rotation, x, _, _ = candidates[best]
+        return rotation, x
+
+    def play(self, engine, max_pieces=None):
+        # 在无界面引擎上连续自动游戏, 返回放置的方块数
+        pieces = 0
+        while not engine.game_over and (max_pieces is None or pieces < max_pieces):
+            move = self.best_move(engine.board, engine.kind, (engine.next_kind,))
+            if move is None or engine.place(*move) is None:
+                engine.game_over = True
+                break
+            pieces += 1
+        return pieces
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    pieces = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    engine = TetrisEngine(random.Random(0))
+    with TetrisAI() as ai:
+        start = time.perf_counter()
+        placed = ai.play(engine, pieces)
+        elapsed = time.perf_counter() - start
+    print(f"方块: {placed}  消行: {engine.lines}  分数: {engine.score}  "
+          f"用时: {elapsed:.2f}s  游戏结束: {engine.game_over}")
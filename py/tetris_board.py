@@ -0,0 +1,236 @@
+# 位棋盘: 每一行用一个整数位掩码表示 (第 j 列对应第 j 位),
+# 碰撞检测是几次按位与, 满行检测是一次相等比较。
+# 颜色平面 colors 只用于绘制。本模块不依赖 pygame, 可用于高速模拟和 AI 搜索。
+
+import random
+
+GRID_WIDTH = 10
+GRID_HEIGHT = 20
+
+# 方块形状定义
+SHAPES = [
+    [[1, 1, 1, 1]],  # I
+    [[1, 1], [1, 1]],  # O
+    [[1, 1, 1], [0, 1, 0]],  # T
+    [[1, 1, 1], [1, 0, 0]],  # L
+    [[1, 1, 1], [0, 0, 1]],  # J
+    [[1, 1, 0], [0, 1, 1]],  # S
+    [[0, 1, 1], [1, 1, 0]]   # Z
+]
+
+FULL_ROW = (1 << GRID_WIDTH) - 1
+
+
+def rotate_shape(shape):
+    # 顺时针旋转 90 度
+    return [list(row) for row in zip(*shape[::-1])]
+
+
+def shape_row_masks(shape, x):
+    # 方块左上角位于第 x 列时每一行的位掩码
+    masks = []
+    for row in shape:
+        mask = 0
+        for j, cell in enumerate(row):
+            if cell:
+                mask |= 1 << (x + j)
+        masks.append(mask)
+    return tuple(masks)
+
+
+# 单个旋转状态: 形状、格子偏移 (dx, dy)、包围盒宽高, 以及每一列的行掩码
+class RotationState:
+    __slots__ = ("shape", "cells", "width", "height", "masks")
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.cells = tuple((j, i) for i, row in enumerate(shape)
+                           for j, cell in enumerate(row) if cell)
+        self.width = len(shape[0])
+        self.height = len(shape)
+        # masks[x] 为方块在第 x 列时的行掩码, 只包含不越过左右边界的列
+        self.masks = tuple(shape_row_masks(shape, x)
+                           for x in range(GRID_WIDTH - self.width + 1))
+
+
+# ROTATIONS[kind][rotation]: 每种方块 4 个旋转状态, 导入时一次性计算
+ROTATIONS = []
+for _shape in SHAPES:
+    _shapes = [_shape]
+    for _ in range(3):
+        _shapes.append(rotate_shape(_shapes[-1]))
+    ROTATIONS.append(tuple(RotationState(shape) for shape in _shapes))
+ROTATIONS = tuple(ROTATIONS)
+
+SHAPE_ROTATIONS = [[state.shape for state in states] for states in ROTATIONS]
+PIECE_MASKS = [[state.masks for state in states] for states in ROTATIONS]
+
+# 踢墙表: 原地旋转放不下时依次尝试的 (dx, dy) 偏移, I 方块较长, 允许横移两格
+_KICKS = ((0, 0), (-1, 0), (1, 0), (0, -1))
+_I_KICKS = ((0, 0), (-1, 0), (1, 0), (-2, 0), (2, 0), (0, -1))
+WALL_KICKS = tuple(_I_KICKS if kind == 0 else _KICKS for kind in range(len(SHAPES)))
+
+
+def spawn_x(kind):
+    return GRID_WIDTH // 2 - ROTATIONS[kind][0].width // 2
+
+
+# track_colors=False 时不维护颜色平面 (colors 为 None), 供 AI 搜索等只关心占用的场合使用
+class BitBoard:
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, track_colors=True):
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1
+        self.rows = [0] * height
+        self.colors = [[0] * width for _ in range(height)] if track_colors else None
+
+    @classmethod
+    def from_rows(cls, rows, width=GRID_WIDTH):
+        board = cls(width, len(rows), track_colors=False)
+        board.rows = list(rows)
+        return board
+
+    def copy(self):
+        board = BitBoard.__new__(BitBoard)
+        board.width = self.width
+        board.height = self.height
+        board.full_row = self.full_row
+        board.rows = self.rows[:]
+        board.colors = [row[:] for row in self.colors] if self.colors is not None else None
+        return board
+
+    def fits(self, masks, x, y):
+        # masks 为 ROTATIONS[kind][rotation].masks; 棋盘顶部以上的行视为空
+        if x < 0 or x >= len(masks):
+            return False
+        rows = self.rows
+        height = self.height
+        for i, mask in enumerate(masks[x]):
+            row = y + i
+            if row >= height:
+                return False
+            if row >= 0 and rows[row] & mask:
+                return False
+        return True
+
+    def place(self, masks, x, y, color=None):
+        # 把方块写入棋盘, 有格子在顶部以上时返回 False (游戏结束)
+        inside = True
+        rows = self.rows
+        for i, mask in enumerate(masks[x]):
+            row = y + i
+            if row < 0:
+                inside = False
+                continue
+            rows[row] |= mask
+            if color is not None and self.colors is not None:
+                color_row = self.colors[row]
+                bits = mask
+                while bits:
+                    low = bits & -bits
+                    color_row[low.bit_length() - 1] = color
+                    bits ^= low
+        return inside
+
+    def clear_lines(self):
+        full = self.full_row
+        rows = self.rows
+        if full not in rows:
+            return 0
+        keep = [i for i, row in enumerate(rows) if row != full]
+        cleared = self.height - len(keep)
+        self.rows = [0] * cleared + [rows[i] for i in keep]
+        if self.colors is not None:
+            self.colors = ([[0] * self.width for _ in range(cleared)] +
+                           [self.colors[i] for i in keep])
+        return cleared
+
+    def drop_y(self, masks, x, y=0):
+        # 从第 y 行竖直下落能到达的最低位置, 起点就放不下时返回 None
+        if not self.fits(masks, x, y):
+            return None
+        while self.fits(masks, x, y + 1):
+            y += 1
+        return y
+
+
+# 无界面的俄罗斯方块引擎: 方块只用 (kind, rotation, x, y) 四个整数表示,
+# 与 Tetris 的交互循环共享旋转表、踢墙表和计分规则 (每消一行 100 分)
+class TetrisEngine:
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random.Random()
+        self.reset()
+
+    def reset(self):
+        self.board = BitBoard()
+        self.score = 0
+        self.lines = 0
+        self.game_over = False
+        self.next_kind = self.rng.randint(0, len(SHAPES) - 1)
+        self.spawn_next()
+
+    def spawn_next(self):
+        kind = self.next_kind
+        self.next_kind = self.rng.randint(0, len(SHAPES) - 1)
+        self.spawn(kind)
+
+    def spawn(self, kind):
+        self.kind = kind
+        self.rotation = 0
+        self.x = spawn_x(kind)
+        self.y = 0
+        if not self.fits(self.rotation, self.x, self.y):
+            self.game_over = True
+
+    def fits(self, rotation, x, y):
+        return self.board.fits(ROTATIONS[self.kind][rotation].masks, x, y)
+
+    def move(self, dx):
+        if self.fits(self.rotation, self.x + dx, self.y):
+            self.x += dx
+            return True
+        return False
+
+    def rotate(self):
+        rotation = (self.rotation + 1) % 4
+        for dx, dy in WALL_KICKS[self.kind]:
+            if self.fits(rotation, self.x + dx, self.y + dy):
+                self.rotation = rotation
+                self.x += dx
+                self.y += dy
+                return True
+        return False
+
+    def drop(self):
+        # 下落一格, 落不下时固定方块, 返回本次消除的行数
+        if self.fits(self.rotation, self.x, self.y + 1):
+            self.y += 1
+            return 0
+        return self.lock()
+
+    def hard_drop(self):
+        while self.fits(self.rotation, self.x, self.y + 1):
+            self.y += 1
+        return self.lock()
+
+    def place(self, rotation, x):
+        # 直接把当前方块以指定旋转放到第 x 列并落下 (AI 使用), 放不下时返回 None
+        masks = ROTATIONS[self.kind][rotation].masks
+        y = self.board.drop_y(masks, x, self.y)
+        if y is None:
+            return None
+        self.rotation = rotation
+        self.x = x
+        self.y = y
+        return self.lock()
+
+    def lock(self):
+        state = ROTATIONS[self.kind][self.rotation]
+        if not self.board.place(state.masks, self.x, self.y, self.kind + 1):
+            self.game_over = True
+        lines = self.board.clear_lines()
+        self.lines += lines
+        self.score += lines * 100
+        if not self.game_over:
+            self.spawn_next()
+        return lines
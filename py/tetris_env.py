@@ -0,0 +1,99 @@
+# 批量向量化的俄罗斯方块环境: N 个棋盘存放在一个 (N, H) 的 uint16 行掩码数组中,
+# 每一步同时为 N 个棋盘各放置一个方块, 返回 N 份观测、奖励和结束标志。
+# 动作是落点编号 rotation * GRID_WIDTH + x, 方块从顶部竖直落下;
+# 计分与 Tetris.run 相同 (每消一行 100 分), 新方块在出生位置放不下时该局结束并自动重开。
+# 形状和旋转表来自 tetris_board, 与交互版本规则一致。
+
+import numpy as np
+
+from tetris_board import GRID_WIDTH, GRID_HEIGHT, FULL_ROW, ROTATIONS, SHAPES, spawn_x
+
+NUM_KINDS = len(SHAPES)
+NUM_ACTIONS = 4 * GRID_WIDTH
+PIECE_ROWS = 4  # 方块包围盒最多 4 行
+
+# MASKS[kind, rotation, x] 为 4 行掩码 (不足 4 行补 0); 越过右边界的列按最右合法列处理
+MASKS = np.zeros((NUM_KINDS, 4, GRID_WIDTH, PIECE_ROWS), dtype=np.uint16)
+for _kind, _states in enumerate(ROTATIONS):
+    for _rotation, _state in enumerate(_states):
+        for _x in range(GRID_WIDTH):
+            _masks = _state.masks[min(_x, len(_state.masks) - 1)]
+            MASKS[_kind, _rotation, _x, :len(_masks)] = _masks
+SPAWN_MASKS = np.stack([MASKS[kind, 0, spawn_x(kind)] for kind in range(NUM_KINDS)])
+
+# 把行掩码展开成 (..., GRID_WIDTH) 的 0/1 数组时用到的位权
+_BITS = (1 << np.arange(GRID_WIDTH)).astype(np.uint16)
+
+
+class TetrisVecEnv:
+    def __init__(self, num_envs, seed=None):
+        self.num_envs = num_envs
+        self.rng = np.random.default_rng(seed)
+        # 底部额外补 PIECE_ROWS 行满行, 用来挡住落到棋盘外的方块
+        self.padded = np.zeros((num_envs, GRID_HEIGHT + PIECE_ROWS), dtype=np.uint16)
+        self.padded[:, GRID_HEIGHT:] = FULL_ROW
+        self.rows = self.padded[:, :GRID_HEIGHT]
+        self.kinds = np.zeros(num_envs, dtype=np.intp)
+        self.next_kinds = np.zeros(num_envs, dtype=np.intp)
+        self.scores = np.zeros(num_envs, dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        # mask 为 None 时重置全部棋盘, 否则只重置 mask 为 True 的棋盘
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        count = int(np.count_nonzero(mask))
+        self.rows[mask] = 0
+        self.scores[mask] = 0
+        self.kinds[mask] = self.rng.integers(0, NUM_KINDS, count)
+        self.next_kinds[mask] = self.rng.integers(0, NUM_KINDS, count)
+        return self.observe()
+
+    def observe(self):
+        board = (self.rows[:, :, None] & _BITS) != 0
+        return {"board": board, "piece": self.kinds.copy(), "next": self.next_kinds.copy()}
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        n = self.num_envs
+        envs = np.arange(n)
+        masks = MASKS[self.kinds, actions // GRID_WIDTH, actions % GRID_WIDTH]  # (N, 4)
+
+        # 每个起始行 y 上方块是否放得下: (N, H + 1)
+        windows = np.lib.stride_tricks.sliding_window_view(self.padded, PIECE_ROWS, axis=1)
+        fits = ((windows & masks[:, None, :]) == 0).all(axis=2)
+
+        # 从顶部落下, 停在第一个放不下的位置之上; 顶部就放不下则本局结束
+        blocked = ~fits
+        blocked[:, -1] = True
+        landing = np.argmax(blocked[:, 1:], axis=1)
+        placed = fits[:, 0]
+
+        # 写入方块 (补出来的底部满行不受影响)
+        for i in range(PIECE_ROWS):
+            row = landing + i
+            self.padded[envs, row] |= np.where(placed, masks[:, i], 0).astype(np.uint16)
+        self.padded[:, GRID_HEIGHT:] = FULL_ROW
+
+        # 消行: 把满行稳定地移到顶部再清零
+        full = self.rows == FULL_ROW
+        lines = full.sum(axis=1)
+        if lines.any():
+            order = np.argsort(~full, axis=1, kind="stable")
+            self.rows[:] = np.take_along_axis(self.rows, order, axis=1)
+            self.rows[np.arange(GRID_HEIGHT) < lines[:, None]] = 0
+
+        rewards = lines * 100
+        self.scores += rewards
+
+        # 下一个方块出生
+        self.kinds[:] = self.next_kinds
+        self.next_kinds[:] = self.rng.integers(0, NUM_KINDS, n)
+        spawn = SPAWN_MASKS[self.kinds]
+        spawn_ok = ((self.padded[:, :PIECE_ROWS] & spawn) == 0).all(axis=1)
+        dones = ~placed | ~spawn_ok
+
+        final_scores = np.where(dones, self.scores, 0)
+        if dones.any():
+            self.reset(dones)
+        return self.observe(), rewards, dones, {"final_score": final_scores}
@@ -0,0 +1,107 @@
+import math
+import pygame
+from collections import OrderedDict
+
+# 渲染缓存: 字体只创建一次, 文字按 (内容, 字号, 颜色) 缓存渲染结果, 静态画面预先烘焙
+
+TEXT_CACHE_SIZE = 256
+SPRITE_CACHE_SIZE = 512
+ANGLE_STEPS = 64  # 枪管等朝向的量化级数
+
+_fonts = {}
+
+
+def get_font(size):
+    # 同一字号的默认字体全局共享, 第一次用到字体时才初始化字体子系统
+    font = _fonts.get(size)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.Font(None, size)
+        _fonts[size] = font
+    return font
+
+
+def optimize(surface, alpha=False):
+    # 有显示窗口时转换为屏幕像素格式, 加快 blit; 无窗口 (headless) 时原样返回
+    if pygame.display.get_surface() is None:
+        return surface
+    return surface.convert_alpha() if alpha else surface.convert()
+
+
+# 按 LRU 策略淘汰的文字 Surface 缓存
+class TextCache:
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def render(self, text, size, color, antialias=True):
+        key = (text, size, color, antialias)
+        entries = self.entries
+        surface = entries.get(key)
+        if surface is not None:
+            entries.move_to_end(key)
+            return surface
+        surface = get_font(size).render(text, antialias, color)
+        entries[key] = surface
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+
+text_cache = TextCache()
+
+
+def render_text(text, size, color):
+    return text_cache.render(text, size, color)
+
+
+# 实体外观只光栅化一次: key 唯一标识一种外观 (类型、尺寸、颜色、量化后的角度等),
+# 第一次用到时调用 draw(surface, key) 在透明 Surface 上绘制, 之后直接返回缓存, 按 LRU 淘汰。
+# draw 应是模块级函数, 外观参数都从 key 中取, 命中缓存时不产生新对象。
+# 填满整个矩形的外观传 alpha=False, 用不透明 Surface 贴图更快。
+class SpriteCache:
+    def __init__(self, max_entries=SPRITE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key, size, draw, alpha=True):
+        entries = self.entries
+        surface = entries.get(key)
+        if surface is not None:
+            entries.move_to_end(key)
+            return surface
+        surface = pygame.Surface(size, pygame.SRCALPHA if alpha else 0)
+        draw(surface, key)
+        surface = optimize(surface, alpha=alpha)
+        entries[key] = surface
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+
+sprite_cache = SpriteCache()
+
+
+def get_sprite(key, size, draw, alpha=True):
+    return sprite_cache.get(key, size, draw, alpha)
+
+
+def quantize_angle(angle, steps=ANGLE_STEPS):
+    # 把弧度量化为 0..steps-1 的级别, 返回 (级别, 对应的角度)
+    step = round(angle * steps / math.tau) % steps
+    return step, step * math.tau / steps
+
+
+def make_overlay(size, color, alpha):
+    # 半透明遮罩, 创建一次后重复使用
+    overlay = optimize(pygame.Surface(size))
+    overlay.fill(color)
+    overlay.set_alpha(alpha)
+    return overlay
@@ -0,0 +1,186 @@
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import struct
+import sys
+import time
+
+# 输入录制与回放: 每局游戏使用带种子的随机数生成器, 每个逻辑帧的输入编码成一条定长记录,
+# 边玩边追加写入日志文件; 回放时按同样的种子和输入无界面地重跑一遍, 并核对最终状态的哈希值。
+#
+# 日志格式 (小端序):
+#   文件头    魔数 b"RPLY", 版本, 头部长度, JSON 头部 (游戏名、种子、记录格式和游戏自己的选项)
+#   记录区    (重复次数 u16, 输入记录) 反复出现, 连续相同的输入合并为一条
+#   结尾      重复次数 0 表示结束, 随后是总帧数 u32 和 16 字节状态哈希; 录制中途崩溃时没有结尾
+#
+# 每个游戏提供 make_replay(log) 创建无界面的游戏对象, 该对象的 tick(*输入) 推进一个逻辑帧,
+# state_hash() 返回当前状态的哈希值。
+
+REPLAY_MAGIC = b"RPLY"
+REPLAY_VERSION = 1
+PREAMBLE = struct.Struct("<4sHI")
+RUN = struct.Struct("<H")
+FOOTER = struct.Struct("<I16s")
+MAX_RUN = 0xFFFF
+FLUSH_INTERVAL = 60  # 每写入这么多条记录刷新一次文件
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 游戏名 -> 源文件 (相对仓库根目录)
+GAMES = {
+    "shooter": "shooter_game.py",
+    "mario": "mario_game.py",
+    "tetris": os.path.join("py", "tetris.py"),
+    "snake": os.path.join("py", "snake_game.py"),
+    "snake_classic": "import pygame.py",
+}
+
+
+def state_digest(*parts):
+    # 状态哈希: NumPy 数组按原始字节, 其他值按 repr
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.tobytes() if hasattr(part, "tobytes") else repr(part).encode())
+        digest.update(b"\0")
+    return digest.digest()
+
+
+def session_seed(argv=None):
+    # --seed N 指定随机种子, 否则随机生成一个 (录制时写入日志)
+    argv = sys.argv if argv is None else argv
+    if "--seed" in argv:
+        return int(argv[argv.index("--seed") + 1])
+    return random.randrange(2 ** 63)
+
+
+def open_recorder(game, seed, fmt, argv=None, **options):
+    # --record 文件: 录制本局输入; 没有该参数时返回 None
+    argv = sys.argv if argv is None else argv
+    if "--record" not in argv:
+        return None
+    return InputRecorder(argv[argv.index("--record") + 1], game, seed, fmt, **options)
+
+
+class InputRecorder:
+    def __init__(self, path, game, seed, fmt, **options):
+        self.record_struct = struct.Struct(fmt)
+        header = dict(options, game=game, seed=seed, format=fmt)
+        data = json.dumps(header, ensure_ascii=False).encode()
+        self.file = open(path, "wb")
+        self.file.write(PREAMBLE.pack(REPLAY_MAGIC, REPLAY_VERSION, len(data)))
+        self.file.write(data)
+        self.ticks = 0
+        self.pending = None
+        self.run = 0
+        self.writes = 0
+
+    def record(self, *values):
+        # 记录一个逻辑帧的输入, 与上一帧相同时只增加重复次数
+        data = self.record_struct.pack(*values)
+        self.ticks += 1
+        if data == self.pending and self.run < MAX_RUN:
+            self.run += 1
+            return
+        self._write_run()
+        self.pending = data
+        self.run = 1
+
+    def _write_run(self):
+        if not self.run:
+            return
+        self.file.write(RUN.pack(self.run))
+        self.file.write(self.pending)
+        self.writes += 1
+        if self.writes % FLUSH_INTERVAL == 0:
+            self.file.flush()
+
+    def close(self, state_hash=None):
+        # 结束录制; 给出 state_hash 时写入结尾供回放核对
+        if self.file.closed:
+            return
+        self._write_run()
+        self.run = 0
+        if state_hash is not None:
+            self.file.write(RUN.pack(0))
+            self.file.write(FOOTER.pack(self.ticks, state_hash))
+        self.file.close()
+
+
+class InputLog:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, version, size = PREAMBLE.unpack_from(self.data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} 不是版本 {REPLAY_VERSION} 的录像文件")
+        self.header = json.loads(self.data[PREAMBLE.size:PREAMBLE.size + size])
+        self.game = self.header["game"]
+        self.seed = self.header["seed"]
+        self.record_struct = struct.Struct(self.header["format"])
+        self.body = PREAMBLE.size + size
+        self.ticks = None
+        self.digest = None
+
+    def __iter__(self):
+        # 逐帧产生输入元组; 读到结尾时记下总帧数和状态哈希
+        data = self.data
+        record = self.record_struct
+        offset = self.body
+        while offset + RUN.size <= len(data):
+            (run,) = RUN.unpack_from(data, offset)
+            offset += RUN.size
+            if run == 0:
+                self.ticks, self.digest = FOOTER.unpack_from(data, offset)
+                return
+            if offset + record.size > len(data):
+                return
+            values = record.unpack_from(data, offset)
+            offset += record.size
+            for _ in range(run):
+                yield values
+
+
+def load_game(game):
+    # 按文件路径载入游戏模块 (有的文件名不是合法的模块名), 回放不需要真实窗口
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    path = os.path.join(ROOT, GAMES[game])
+    directory = os.path.dirname(path)
+    for entry in (ROOT, directory):
+        if entry not in sys.path:
+            sys.path.insert(0, entry)
+    spec = importlib.util.spec_from_file_location(f"replay_{game}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def replay(path):
+    # 无界面全速重跑一局, 返回 (帧数, 最终状态哈希, 录像中的哈希或 None)
+    log = InputLog(path)
+    game = load_game(log.game).make_replay(log)
+    ticks = 0
+    for values in log:
+        game.tick(*values)
+        ticks += 1
+    return ticks, game.state_hash(), log.digest
+
+
+if __name__ == "__main__":
+    # python replay.py 录像文件...
+    failed = False
+    for path in sys.argv[1:]:
+        start = time.perf_counter()
+        ticks, digest, expected = replay(path)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            result = "无结尾 (录制未正常结束), 未核对"
+        elif digest == expected:
+            result = "状态一致"
+        else:
+            result = "状态不一致!"
+            failed = True
+        print(f"{path}: {ticks} 帧, {elapsed:.2f}s, 哈希 {digest.hex()} — {result}")
+    sys.exit(1 if failed else 0)
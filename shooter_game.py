@@ -2,14 +2,20 @@ import pygame
 import math
 import random
 import sys
-
-# 初始化 pygame
-pygame.init()
+from collections import namedtuple
+import numpy as np
+from render_cache import ANGLE_STEPS, get_sprite, make_overlay, optimize, quantize_angle, render_text
+from dirty_rects import DirtyRects
+from frame_profiler import profiler, start_profiling
+from game_loop import FixedStepLoop
+from replay import open_recorder, session_seed, state_digest
+from window import open_window
 
 # 游戏常量
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 700
-FPS = 60
+FPS = 60  # 逻辑帧率, 渲染帧率见 game_loop
+FRAME_MS = 1000 / FPS  # 每个逻辑帧推进的模拟时间
 
 # 颜色定义
 BLACK = (0, 0, 0)
@@ -23,6 +29,110 @@ PURPLE = (128, 0, 128)
 GRAY = (128, 128, 128)
 DARK_GREEN = (0, 100, 0)
 
+# 碰撞检测
+HIT_RADIUS = 15
+COLLISION_CELL_SIZE = 50  # 网格边长不小于命中半径, 只需查询相邻 3x3 格子
+
+# 子弹
+OWNER_PLAYER = 0
+OWNER_ENEMY = 1
+BULLET_SPEED = 8
+BULLET_RADIUS = 3
+BULLET_DAMAGE = 25
+BULLET_CAPACITY = 1024  # 预分配槽位数, 用满时翻倍扩容
+
+# 敌人
+ENEMY_SIZE = 25
+ENEMY_MAX_HEALTH = 50
+ENEMY_CAPACITY = 64
+
+# 枪管 (长度, 粗细)
+PLAYER_BARREL = (25, 3)
+ENEMY_BARREL = (20, 2)
+
+# 实体外观的精灵: 每种外观只在第一次出现时绘制, 之后从 render_cache 的精灵缓存中直接贴图。
+# 车身中心和圆心都放在精灵中心, 枪管朝向按 ANGLE_STEPS 级量化。
+def draw_tank_sprite(surface, key):
+    _, size, color, length, thickness, step = key
+    center = length + thickness
+    body = pygame.Rect(center - size // 2, center - size // 2, size, size)
+    pygame.draw.rect(surface, color, body)
+    pygame.draw.rect(surface, WHITE, body, 2)
+    angle = step * math.tau / ANGLE_STEPS
+    end = (center + math.cos(angle) * length, center + math.sin(angle) * length)
+    pygame.draw.line(surface, BLACK, (center, center), end, thickness)
+
+def tank_sprite(size, color, barrel, angle):
+    # 返回 (精灵, 车身左上角到精灵左上角的偏移)
+    length, thickness = barrel
+    step, _ = quantize_angle(angle)
+    center = length + thickness
+    sprite = get_sprite(("tank", size, color, length, thickness, step),
+                        (center * 2 + 1, center * 2 + 1), draw_tank_sprite)
+    return sprite, size // 2 - center
+
+def draw_bar_sprite(surface, key):
+    _, width, height, filled = key
+    surface.fill(RED)
+    pygame.draw.rect(surface, GREEN, (0, 0, filled, height))
+
+def health_bar_sprite(width, height, health, max_health):
+    filled = max(0, min(width, int(width * (health / max_health))))
+    return get_sprite(("bar", width, height, filled), (width, height), draw_bar_sprite, alpha=False)
+
+def draw_ball_sprite(surface, key):
+    _, radius, color, symbol = key
+    center = (radius + 1, radius + 1)
+    pygame.draw.circle(surface, color, center, radius)
+    pygame.draw.circle(surface, WHITE, center, radius, 2 if symbol else 1)
+    if symbol:
+        text = render_text(symbol, 24, WHITE)
+        surface.blit(text, text.get_rect(center=center))
+
+def ball_sprite(radius, color, symbol=None):
+    # 子弹 (细描边) 和道具 (粗描边加符号) 共用的圆形精灵, 圆心距精灵左上角 radius + 1
+    return get_sprite(("ball", radius, color, symbol), (radius * 2 + 3, radius * 2 + 3),
+                      draw_ball_sprite)
+
+# 一帧的玩家输入: move_x/move_y 取 -1、0、1, (aim_x, aim_y) 为瞄准点, fire 表示本帧开火
+Action = namedtuple("Action", ["move_x", "move_y", "aim_x", "aim_y", "fire"])
+
+# 录像中每帧的输入记录: Action 加上暂停切换和重新开始
+RECORD_FORMAT = "<bbhh???"
+
+# 从键盘和鼠标读取输入, 开火由 Game.run 中的鼠标点击事件处理
+class KeyboardInput:
+    def poll(self, player):
+        keys = pygame.key.get_pressed()
+        move_x = 0
+        move_y = 0
+        if keys[pygame.K_w] or keys[pygame.K_UP]:
+            move_y -= 1
+        if keys[pygame.K_s] or keys[pygame.K_DOWN]:
+            move_y += 1
+        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
+            move_x -= 1
+        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+            move_x += 1
+        mouse_x, mouse_y = pygame.mouse.get_pos()
+        return Action(move_x, move_y, mouse_x, mouse_y, False)
+
+# 按顺序回放预先准备好的输入序列, 用完后循环 (loop=True) 或保持静止
+class ScriptedInput:
+    def __init__(self, actions, loop=True):
+        self.actions = list(actions)
+        self.loop = loop
+        self.index = 0
+
+    def poll(self, player):
+        if self.index >= len(self.actions):
+            if not self.loop or not self.actions:
+                return Action(0, 0, player.x, player.y, False)
+            self.index = 0
+        action = self.actions[self.index]
+        self.index += 1
+        return action
+
 class Player:
     def __init__(self, x, y):
         self.x = x
@@ -34,21 +144,18 @@ class Player:
         self.max_health = 100
         self.angle = 0
         self.rect = pygame.Rect(x, y, self.width, self.height)
+        # 上一个逻辑帧的位置, 绘制时在两帧之间插值
+        self.prev_x = x
+        self.prev_y = y
         self.last_shot = 0
         self.shoot_delay = 200  # 毫秒
         
-    def update(self):
-        keys = pygame.key.get_pressed()
-        
+    def update(self, action):
         # 移动
-        if keys[pygame.K_w] or keys[pygame.K_UP]:
-            self.y -= self.speed
-        if keys[pygame.K_s] or keys[pygame.K_DOWN]:
-            self.y += self.speed
-        if keys[pygame.K_a] or keys[pygame.K_LEFT]:
-            self.x -= self.speed
-        if keys[pygame.K_d] or keys[pygame.K_RIGHT]:
-            self.x += self.speed
+        self.prev_x = self.x
+        self.prev_y = self.y
+        self.x += action.move_x * self.speed
+        self.y += action.move_y * self.speed
             
         # 边界检查
         self.x = max(0, min(SCREEN_WIDTH - self.width, self.x))
@@ -58,14 +165,12 @@ class Player:
         self.rect.x = self.x
         self.rect.y = self.y
         
-        # 鼠标瞄准
-        mouse_x, mouse_y = pygame.mouse.get_pos()
-        dx = mouse_x - (self.x + self.width // 2)
-        dy = mouse_y - (self.y + self.height // 2)
+        # 瞄准
+        dx = action.aim_x - (self.x + self.width // 2)
+        dy = action.aim_y - (self.y + self.height // 2)
         self.angle = math.atan2(dy, dx)
         
-    def shoot(self):
-        current_time = pygame.time.get_ticks()
+    def shoot(self, bullets, current_time):
         if current_time - self.last_shot > self.shoot_delay:
             self.last_shot = current_time
             
@@ -73,140 +178,282 @@ class Player:
             start_x = self.x + self.width // 2 + math.cos(self.angle) * 20
             start_y = self.y + self.height // 2 + math.sin(self.angle) * 20
             
-            return Bullet(start_x, start_y, self.angle, "player")
-        return None
+            bullets.fire(start_x, start_y, self.angle, OWNER_PLAYER)
+            return True
+        return False
         
     def take_damage(self, damage):
         self.health -= damage
         if self.health < 0:
             self.health = 0
             
-    def draw(self, screen):
-        # 绘制玩家身体
-        pygame.draw.rect(screen, BLUE, self.rect)
-        pygame.draw.rect(screen, WHITE, self.rect, 2)
+    def draw(self, screen, alpha=1.0):
+        # alpha 为插值系数: 0 画在上一个逻辑帧的位置, 1 画在当前位置
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        y = self.prev_y + (self.y - self.prev_y) * alpha
         
-        # 绘制枪管
-        center_x = self.x + self.width // 2
-        center_y = self.y + self.height // 2
-        end_x = center_x + math.cos(self.angle) * 25
-        end_y = center_y + math.sin(self.angle) * 25
-        pygame.draw.line(screen, BLACK, (center_x, center_y), (end_x, end_y), 3)
+        # 绘制玩家身体和枪管
+        sprite, offset = tank_sprite(self.width, BLUE, PLAYER_BARREL, self.angle)
+        body = screen.blit(sprite, (round(x) + offset, round(y) + offset))
         
         # 绘制血条
-        bar_width = 40
-        bar_height = 6
-        bar_x = self.x - 5
-        bar_y = self.y - 15
-        
-        # 背景条
-        pygame.draw.rect(screen, RED, (bar_x, bar_y, bar_width, bar_height))
-        # 血量条
-        health_width = int(bar_width * (self.health / self.max_health))
-        pygame.draw.rect(screen, GREEN, (bar_x, bar_y, health_width, bar_height))
-
-class Enemy:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.width = 25
-        self.height = 25
-        self.speed = random.uniform(1, 2)
-        self.health = 50
-        self.max_health = 50
-        self.angle = 0
-        self.rect = pygame.Rect(x, y, self.width, self.height)
-        self.last_shot = 0
-        self.shoot_delay = random.randint(1000, 2000)
-        self.ai_timer = 0
-        self.target_x = x
-        self.target_y = y
+        bar = screen.blit(health_bar_sprite(40, 6, self.health, self.max_health),
+                          (x - 5, y - 15))
         
-    def update(self, player):
-        # AI 移动
-        dx = player.x - self.x
-        dy = player.y - self.y
-        distance = math.sqrt(dx*dx + dy*dy)
-        
-        if distance > 0:
-            # 向玩家移动
-            self.x += (dx / distance) * self.speed
-            self.y += (dy / distance) * self.speed
-            
-            # 瞄准玩家
-            self.angle = math.atan2(dy, dx)
+        # 返回本次绘制覆盖的区域, 供脏矩形渲染使用
+        return body.union(bar)
+
+# 所有敌人的状态存放在 NumPy 数组中, 移动、瞄准、边界限制和射击都是一次批量运算
+# 数组前 count 个元素是存活的敌人, 死亡的敌人在 remove_dead 中统一压缩掉
+class EnemyGroup:
+    def __init__(self, capacity=ENEMY_CAPACITY, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.width = ENEMY_SIZE
+        self.height = ENEMY_SIZE
+        self.max_health = ENEMY_MAX_HEALTH
+        self.count = 0
+        self._allocate(capacity)
+        
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.prev_x = np.zeros(capacity)  # 上一个逻辑帧的位置, 用于绘制插值
+        self.prev_y = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+        self.angle = np.zeros(capacity)
+        self.health = np.zeros(capacity, dtype=np.int32)
+        self.last_shot = np.zeros(capacity, dtype=np.int64)
+        self.shoot_delay = np.zeros(capacity, dtype=np.int64)
+        
+    def __len__(self):
+        return self.count
+        
+    def _grow(self):
+        n = self.count
+        old = {name: getattr(self, name)[:n] for name in
+               ("x", "y", "prev_x", "prev_y", "speed", "angle", "health", "last_shot",
+                "shoot_delay")}
+        self._allocate(self.capacity * 2)
+        for name, arr in old.items():
+            getattr(self, name)[:n] = arr
             
-        # 边界检查
-        self.x = max(0, min(SCREEN_WIDTH - self.width, self.x))
-        self.y = max(0, min(SCREEN_HEIGHT - self.height, self.y))
+    def spawn(self, x, y):
+        if self.count == self.capacity:
+            self._grow()
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.prev_x[i] = x
+        self.prev_y[i] = y
+        self.speed[i] = self.rng.uniform(1, 2)
+        self.angle[i] = 0
+        self.health[i] = self.max_health
+        self.last_shot[i] = 0
+        self.shoot_delay[i] = self.rng.integers(1000, 2001)
+        self.count += 1
+        
+    def clear(self):
+        self.count = 0
+        
+    def centers(self):
+        n = self.count
+        return self.x[:n] + self.width // 2, self.y[:n] + self.height // 2
         
-        self.rect.x = self.x
-        self.rect.y = self.y
+    def update(self, player):
+        n = self.count
+        if n == 0:
+            return
+        x = self.x[:n]
+        y = self.y[:n]
+        self.prev_x[:n] = x
+        self.prev_y[:n] = y
+        
+        # AI 移动: 全体敌人向玩家移动并瞄准玩家
+        dx = player.x - x
+        dy = player.y - y
+        distance = np.hypot(dx, dy)
+        moving = distance > 0
+        step = np.divide(self.speed[:n], distance, out=np.zeros(n), where=moving)
+        x += dx * step
+        y += dy * step
+        np.copyto(self.angle[:n], np.arctan2(dy, dx), where=moving)
         
-    def shoot(self):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.last_shot > self.shoot_delay:
-            self.last_shot = current_time
-            self.shoot_delay = random.randint(1000, 2000)
-            
-            start_x = self.x + self.width // 2 + math.cos(self.angle) * 15
-            start_y = self.y + self.height // 2 + math.sin(self.angle) * 15
+        # 边界检查
+        np.clip(x, 0, SCREEN_WIDTH - self.width, out=x)
+        np.clip(y, 0, SCREEN_HEIGHT - self.height, out=y)
+        
+    def shoot(self, bullets, current_time):
+        n = self.count
+        ready = np.flatnonzero(current_time - self.last_shot[:n] > self.shoot_delay[:n])
+        if len(ready) == 0:
+            return 0
+        self.last_shot[ready] = current_time
+        self.shoot_delay[ready] = self.rng.integers(1000, 2001, size=len(ready))
+        
+        angle = self.angle[ready]
+        start_x = self.x[ready] + self.width // 2 + np.cos(angle) * 15
+        start_y = self.y[ready] + self.height // 2 + np.sin(angle) * 15
+        bullets.fire_many(start_x, start_y, angle, OWNER_ENEMY)
+        return len(ready)
+        
+    def touching(self, rect):
+        # 与矩形重叠的敌人数量 (与 Rect.colliderect 一样按整数坐标判断)
+        n = self.count
+        left = self.x[:n].astype(np.int64)
+        top = self.y[:n].astype(np.int64)
+        overlap = ((left < rect.right) & (left + self.width > rect.left) &
+                   (top < rect.bottom) & (top + self.height > rect.top))
+        return int(np.count_nonzero(overlap))
+        
+    def remove_dead(self):
+        n = self.count
+        keep = self.health[:n] > 0
+        alive = int(np.count_nonzero(keep))
+        if alive != n:
+            for arr in (self.x, self.y, self.prev_x, self.prev_y, self.speed, self.angle,
+                        self.health, self.last_shot, self.shoot_delay):
+                arr[:alive] = arr[:n][keep]
+            self.count = alive
+        return n - alive
+        
+    def draw(self, screen, alpha=1.0):
+        # 每个敌人贴车身精灵和血条精灵, 全部放进一次 blits 调用; 位置按 alpha 在两个逻辑帧之间插值
+        n = self.count
+        xs = self.x[:n]
+        ys = self.y[:n]
+        if alpha < 1.0:
+            prev_x = self.prev_x[:n]
+            prev_y = self.prev_y[:n]
+            xs = prev_x + (xs - prev_x) * alpha
+            ys = prev_y + (ys - prev_y) * alpha
+        sprites = []
+        for x, y, angle, health in zip(xs.astype(int).tolist(),
+                                       ys.astype(int).tolist(),
+                                       self.angle[:n].tolist(), self.health[:n].tolist()):
+            sprite, offset = tank_sprite(self.width, RED, ENEMY_BARREL, angle)
+            sprites.append((sprite, (x + offset, y + offset)))
+            sprites.append((health_bar_sprite(30, 4, health, self.max_health), (x - 2, y - 10)))
+        rects = screen.blits(sprites)
+        return [rects[i].union(rects[i + 1]) for i in range(0, len(rects), 2)]
+
+# 结构数组(SoA)子弹系统: 所有子弹存放在预分配的 NumPy 数组中,
+# 空闲槽位用栈管理, 开火时不创建对象, 每帧的移动和出界剔除都是向量化运算
+class BulletPool:
+    def __init__(self, capacity=BULLET_CAPACITY):
+        self.capacity = capacity
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.owner = np.zeros(capacity, dtype=np.int8)
+        self.damage = np.zeros(capacity, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        # 空闲槽位栈, 栈顶在 free[free_count - 1]
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.intp)
+        self.free_count = capacity
+        
+    def __len__(self):
+        return self.capacity - self.free_count
+        
+    def _grow(self):
+        old = self.capacity
+        self.capacity = old * 2
+        for name in ("x", "y", "vx", "vy", "owner", "damage", "alive"):
+            arr = getattr(self, name)
+            grown = np.zeros(self.capacity, dtype=arr.dtype)
+            grown[:old] = arr
+            setattr(self, name, grown)
+        # 新槽位压在栈底, 原有的空闲槽位保持在栈顶
+        free = np.zeros(self.capacity, dtype=np.intp)
+        free[:old] = np.arange(self.capacity - 1, old - 1, -1)
+        free[old:old + self.free_count] = self.free[:self.free_count]
+        self.free = free
+        self.free_count += old
+        
+    def fire(self, x, y, angle, owner, damage=BULLET_DAMAGE):
+        if self.free_count == 0:
+            self._grow()
+        self.free_count -= 1
+        i = self.free[self.free_count]
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = math.cos(angle) * BULLET_SPEED
+        self.vy[i] = math.sin(angle) * BULLET_SPEED
+        self.owner[i] = owner
+        self.damage[i] = damage
+        self.alive[i] = True
+        return i
+        
+    def fire_many(self, x, y, angle, owner, damage=BULLET_DAMAGE):
+        count = len(angle)
+        while self.free_count < count:
+            self._grow()
+        self.free_count -= count
+        slots = self.free[self.free_count:self.free_count + count]
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vx[slots] = np.cos(angle) * BULLET_SPEED
+        self.vy[slots] = np.sin(angle) * BULLET_SPEED
+        self.owner[slots] = owner
+        self.damage[slots] = damage
+        self.alive[slots] = True
+        return slots
+        
+    def kill(self, indices):
+        # indices 中不能有重复下标
+        indices = indices[self.alive[indices]]
+        count = len(indices)
+        if count:
+            self.alive[indices] = False
+            self.free[self.free_count:self.free_count + count] = indices
+            self.free_count += count
             
-            return Bullet(start_x, start_y, self.angle, "enemy")
-        return None
-        
-    def take_damage(self, damage):
-        self.health -= damage
-        
-    def draw(self, screen):
-        # 绘制敌人身体
-        pygame.draw.rect(screen, RED, self.rect)
-        pygame.draw.rect(screen, WHITE, self.rect, 2)
-        
-        # 绘制枪管
-        center_x = self.x + self.width // 2
-        center_y = self.y + self.height // 2
-        end_x = center_x + math.cos(self.angle) * 20
-        end_y = center_y + math.sin(self.angle) * 20
-        pygame.draw.line(screen, BLACK, (center_x, center_y), (end_x, end_y), 2)
+    def clear(self):
+        self.alive[:] = False
+        self.free[:] = np.arange(self.capacity - 1, -1, -1)
+        self.free_count = self.capacity
         
-        # 绘制血条
-        bar_width = 30
-        bar_height = 4
-        bar_x = self.x - 2
-        bar_y = self.y - 10
-        
-        pygame.draw.rect(screen, RED, (bar_x, bar_y, bar_width, bar_height))
-        health_width = int(bar_width * (self.health / self.max_health))
-        pygame.draw.rect(screen, GREEN, (bar_x, bar_y, health_width, bar_height))
-
-class Bullet:
-    def __init__(self, x, y, angle, owner):
-        self.x = x
-        self.y = y
-        self.angle = angle
-        self.speed = 8
-        self.owner = owner
-        self.radius = 3
-        self.damage = 25
-        self.vel_x = math.cos(angle) * self.speed
-        self.vel_y = math.sin(angle) * self.speed
+    def active(self, owner=None):
+        if owner is None:
+            return np.flatnonzero(self.alive)
+        return np.flatnonzero(self.alive & (self.owner == owner))
         
     def update(self):
-        self.x += self.vel_x
-        self.y += self.vel_y
-        
-    def is_off_screen(self):
-        return (self.x < 0 or self.x > SCREEN_WIDTH or 
-                self.y < 0 or self.y > SCREEN_HEIGHT)
-                
-    def draw(self, screen):
-        color = YELLOW if self.owner == "player" else ORANGE
-        pygame.draw.circle(screen, color, (int(self.x), int(self.y)), self.radius)
-        pygame.draw.circle(screen, WHITE, (int(self.x), int(self.y)), self.radius, 1)
+        alive = self.alive
+        np.add(self.x, self.vx, out=self.x, where=alive)
+        np.add(self.y, self.vy, out=self.y, where=alive)
+        
+        # 出界剔除
+        x = self.x
+        y = self.y
+        off_screen = alive & ((x < 0) | (x > SCREEN_WIDTH) | (y < 0) | (y > SCREEN_HEIGHT))
+        self.kill(np.flatnonzero(off_screen))
+        
+    def hits(self, cx, cy, radius, owner):
+        # 圆与点的命中测试: 返回距离 (cx, cy) 小于 radius 的指定阵营子弹下标
+        dx = self.x - cx
+        dy = self.y - cy
+        inside = (dx * dx + dy * dy) < radius * radius
+        return np.flatnonzero(inside & self.alive & (self.owner == owner))
+        
+    def draw(self, screen, alpha=1.0):
+        # 子弹匀速直线运动, 按速度从当前位置往回推出插值位置
+        indices = self.active()
+        xs = self.x[indices]
+        ys = self.y[indices]
+        if alpha < 1.0:
+            xs = xs - self.vx[indices] * (1.0 - alpha)
+            ys = ys - self.vy[indices] * (1.0 - alpha)
+        sprites = (ball_sprite(BULLET_RADIUS, YELLOW), ball_sprite(BULLET_RADIUS, ORANGE))
+        offset = BULLET_RADIUS + 1
+        return screen.blits([(sprites[owner], (x - offset, y - offset))
+                             for x, y, owner in zip(xs.astype(int).tolist(),
+                                                    ys.astype(int).tolist(),
+                                                    self.owner[indices].tolist())])
 
 class PowerUp:
-    def __init__(self, x, y, type):
+    def __init__(self, x, y, type, spawn_time):
         self.x = x
         self.y = y
         self.type = type  # "health", "speed", "damage"
@@ -214,7 +461,7 @@ class PowerUp:
         self.rect = pygame.Rect(x - self.radius, y - self.radius, 
                                self.radius * 2, self.radius * 2)
         self.collected = False
-        self.spawn_time = pygame.time.get_ticks()
+        self.spawn_time = spawn_time
         
     def draw(self, screen):
         if not self.collected:
@@ -228,25 +475,64 @@ class PowerUp:
                 color = RED
                 symbol = "D"
                 
-            pygame.draw.circle(screen, color, (int(self.x), int(self.y)), self.radius)
-            pygame.draw.circle(screen, WHITE, (int(self.x), int(self.y)), self.radius, 2)
-            
-            # 绘制符号
-            font = pygame.font.Font(None, 24)
-            text = font.render(symbol, True, WHITE)
-            text_rect = text.get_rect(center=(self.x, self.y))
-            screen.blit(text, text_rect)
+            # 圆、描边和符号预先绘制在同一个精灵上
+            offset = self.radius + 1
+            return screen.blit(ball_sprite(self.radius, color, symbol),
+                               (int(self.x) - offset, int(self.y) - offset))
+        return None
+
+# 均匀网格空间哈希, 用于碰撞检测的粗筛阶段
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        self.cells.clear()
+
+    def insert(self, item, x, y):
+        key = (int(x // self.cell_size), int(y // self.cell_size))
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [item]
+        else:
+            bucket.append(item)
 
+    def query(self, x, y):
+        # 返回 (x, y) 所在格子及其周围 8 个格子中的所有对象
+        cx = int(x // self.cell_size)
+        cy = int(y // self.cell_size)
+        cells = self.cells
+        found = []
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                bucket = cells.get((gx, gy))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+# headless=True 时不创建窗口, 画面绘制到离屏 Surface 上, 输入来自 input_source,
+# 可以脱离显示器以远超实时的速度反复调用 update() / step()。
+# 所有随机数来自以 seed 初始化的生成器, 同样的种子和输入总是得到同样的一局。
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("2D 枪战游戏")
-        self.clock = pygame.time.Clock()
+    def __init__(self, headless=False, input_source=None, dirty_rects=False, seed=None):
+        self.headless = headless
+        if headless:
+            self.screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        else:
+            self.screen = open_window((SCREEN_WIDTH, SCREEN_HEIGHT), "2D 枪战游戏")
+        if input_source is None:
+            input_source = ScriptedInput([]) if headless else KeyboardInput()
+        self.input_source = input_source
+        
+        # 模拟时钟: 计时全部基于逻辑帧数而不是墙钟时间
+        self.ticks = 0
+        self.rng = random.Random(seed)
         
         # 游戏对象
         self.player = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-        self.enemies = []
-        self.bullets = []
+        self.enemies = EnemyGroup(rng=np.random.default_rng(seed))
+        self.bullets = BulletPool()
         self.powerups = []
         
         # 游戏状态
@@ -256,9 +542,13 @@ class Game:
         self.game_over = False
         self.paused = False
         
-        # 字体
-        self.font = pygame.font.Font(None, 36)
-        self.big_font = pygame.font.Font(None, 72)
+        # 预渲染的静态画面
+        self.background = self.build_background()
+        self.overlay = make_overlay((SCREEN_WIDTH, SCREEN_HEIGHT), BLACK, 128)
+        
+        # 可选的脏矩形渲染 (只提交变化的区域)
+        self.dirty = DirtyRects() if dirty_rects else None
+        self.overlay_visible = False
         
         # 敌人生成
         self.enemy_spawn_timer = 0
@@ -268,59 +558,100 @@ class Game:
         self.powerup_spawn_timer = 0
         self.powerup_spawn_delay = 15000
         
+        # 碰撞检测用的空间哈希
+        self.enemy_grid = SpatialHash(COLLISION_CELL_SIZE)
+        
+    def build_background(self):
+        # 背景和网格只绘制一次, 每帧整体 blit
+        background = optimize(pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)))
+        background.fill(DARK_GREEN)
+        for x in range(0, SCREEN_WIDTH, 50):
+            pygame.draw.line(background, (0, 50, 0), (x, 0), (x, SCREEN_HEIGHT))
+        for y in range(0, SCREEN_HEIGHT, 50):
+            pygame.draw.line(background, (0, 50, 0), (0, y), (SCREEN_WIDTH, y))
+        return background
+        
     def spawn_enemy(self):
         # 在屏幕边缘随机生成敌人
-        side = random.randint(0, 3)
+        side = self.rng.randint(0, 3)
         if side == 0:  # 上边
-            x = random.randint(0, SCREEN_WIDTH)
+            x = self.rng.randint(0, SCREEN_WIDTH)
             y = 0
         elif side == 1:  # 右边
             x = SCREEN_WIDTH
-            y = random.randint(0, SCREEN_HEIGHT)
+            y = self.rng.randint(0, SCREEN_HEIGHT)
         elif side == 2:  # 下边
-            x = random.randint(0, SCREEN_WIDTH)
+            x = self.rng.randint(0, SCREEN_WIDTH)
             y = SCREEN_HEIGHT
         else:  # 左边
             x = 0
-            y = random.randint(0, SCREEN_HEIGHT)
+            y = self.rng.randint(0, SCREEN_HEIGHT)
             
-        self.enemies.append(Enemy(x, y))
+        self.enemies.spawn(x, y)
         
     def spawn_powerup(self):
-        x = random.randint(50, SCREEN_WIDTH - 50)
-        y = random.randint(50, SCREEN_HEIGHT - 50)
-        powerup_type = random.choice(["health", "speed", "damage"])
-        self.powerups.append(PowerUp(x, y, powerup_type))
+        x = self.rng.randint(50, SCREEN_WIDTH - 50)
+        y = self.rng.randint(50, SCREEN_HEIGHT - 50)
+        powerup_type = self.rng.choice(["health", "speed", "damage"])
+        self.powerups.append(PowerUp(x, y, powerup_type, self.current_time))
         
     def handle_collisions(self):
+        hit_radius_sq = HIT_RADIUS * HIT_RADIUS
+        
+        # 按敌人中心重建空间哈希, 记录下标以保持原有的命中优先顺序
+        enemies = self.enemies
+        centers_x, centers_y = enemies.centers()
+        centers_x = centers_x.tolist()
+        centers_y = centers_y.tolist()
+        grid = self.enemy_grid
+        grid.clear()
+        for index, (cx, cy) in enumerate(zip(centers_x, centers_y)):
+            grid.insert(index, cx, cy)
+            
         # 子弹与敌人碰撞
-        for bullet in self.bullets[:]:
-            if bullet.owner == "player":
-                for enemy in self.enemies[:]:
-                    if math.sqrt((bullet.x - enemy.x - enemy.width//2)**2 + 
-                               (bullet.y - enemy.y - enemy.height//2)**2) < 15:
-                        enemy.take_damage(bullet.damage)
-                        if bullet in self.bullets:
-                            self.bullets.remove(bullet)
-                        if enemy.health <= 0:
-                            self.enemies.remove(enemy)
-                            self.score += 100
-                            self.enemies_killed += 1
-                        break
-                        
+        bullets = self.bullets
+        health = enemies.health[:enemies.count].tolist()
+        killed = False
+        spent_bullets = []
+        player_bullets = bullets.active(OWNER_PLAYER)
+        for i, bx, by in zip(player_bullets.tolist(), bullets.x[player_bullets].tolist(),
+                             bullets.y[player_bullets].tolist()):
+            target = None
+            for index in grid.query(bx, by):
+                if health[index] <= 0 or (target is not None and index >= target):
+                    continue
+                dx = bx - centers_x[index]
+                dy = by - centers_y[index]
+                if dx * dx + dy * dy < hit_radius_sq:
+                    target = index
+            if target is not None:
+                health[target] -= int(bullets.damage[i])
+                spent_bullets.append(i)
+                if health[target] <= 0:
+                    killed = True
+                    self.score += 100
+                    self.enemies_killed += 1
+        if spent_bullets:
+            enemies.health[:enemies.count] = health
+                    
         # 敌人子弹与玩家碰撞
-        for bullet in self.bullets[:]:
-            if bullet.owner == "enemy":
-                if math.sqrt((bullet.x - self.player.x - self.player.width//2)**2 + 
-                           (bullet.y - self.player.y - self.player.height//2)**2) < 15:
-                    self.player.take_damage(bullet.damage)
-                    if bullet in self.bullets:
-                        self.bullets.remove(bullet)
-                        
+        hits = bullets.hits(self.player.x + self.player.width // 2,
+                            self.player.y + self.player.height // 2,
+                            HIT_RADIUS, OWNER_ENEMY)
+        if len(hits):
+            self.player.take_damage(int(bullets.damage[hits].sum()))
+            
+        # 批量移除命中的子弹和死亡的敌人
+        if spent_bullets:
+            bullets.kill(np.array(spent_bullets, dtype=np.intp))
+        bullets.kill(hits)
+        if killed:
+            enemies.remove_dead()
+            
         # 玩家与敌人碰撞
-        for enemy in self.enemies:
-            if self.player.rect.colliderect(enemy.rect):
-                self.player.take_damage(1)  # 持续伤害
+        touching = enemies.touching(self.player.rect)
+        if touching:
+            self.player.take_damage(touching)  # 持续伤害, 每个接触的敌人 1 点
                 
         # 玩家与道具碰撞
         for powerup in self.powerups[:]:
@@ -335,31 +666,33 @@ class Game:
                     self.player.shoot_delay = max(100, self.player.shoot_delay - 50)
                 self.powerups.remove(powerup)
                 
-    def update(self):
+    @property
+    def current_time(self):
+        return int(self.ticks * FRAME_MS)
+        
+    def update(self, action=None):
         if self.game_over or self.paused:
             return
+        self.ticks += 1
+        current_time = self.current_time
             
-        # 更新玩家
-        self.player.update()
+        # 更新玩家 (没有给出输入时从 input_source 读取)
+        if action is None:
+            action = self.input_source.poll(self.player)
+        self.player.update(action)
+        if action.fire:
+            self.player.shoot(self.bullets, current_time)
         
         # 更新敌人
-        for enemy in self.enemies:
-            enemy.update(self.player)
+        self.enemies.update(self.player)
             
         # 更新子弹
-        for bullet in self.bullets[:]:
-            bullet.update()
-            if bullet.is_off_screen():
-                self.bullets.remove(bullet)
+        self.bullets.update()
                 
         # 敌人射击
-        for enemy in self.enemies:
-            new_bullet = enemy.shoot()
-            if new_bullet:
-                self.bullets.append(new_bullet)
+        self.enemies.shoot(self.bullets, current_time)
                 
         # 生成敌人
-        current_time = pygame.time.get_ticks()
         if current_time - self.enemy_spawn_timer > self.enemy_spawn_delay:
             self.spawn_enemy()
             self.enemy_spawn_timer = current_time
@@ -370,7 +703,8 @@ class Game:
             self.powerup_spawn_timer = current_time
             
         # 处理碰撞
-        self.handle_collisions()
+        with profiler.scope("collisions"):
+            self.handle_collisions()
         
         # 检查游戏结束
         if self.player.health <= 0:
@@ -381,55 +715,73 @@ class Game:
             self.wave += 1
             self.enemy_spawn_delay = max(1000, self.enemy_spawn_delay - 200)
             
-    def draw(self):
-        # 清屏
-        self.screen.fill(DARK_GREEN)
-        
-        # 绘制网格背景
-        for x in range(0, SCREEN_WIDTH, 50):
-            pygame.draw.line(self.screen, (0, 50, 0), (x, 0), (x, SCREEN_HEIGHT))
-        for y in range(0, SCREEN_HEIGHT, 50):
-            pygame.draw.line(self.screen, (0, 50, 0), (0, y), (SCREEN_WIDTH, y))
+    def draw(self, alpha=1.0):
+        # alpha 为渲染插值系数 (见 game_loop), 暂停和结束时画面静止, 直接画当前状态
+        dirty = self.dirty
+        overlay = self.game_over or self.paused
+        if overlay:
+            alpha = 1.0
+        if dirty and (overlay or self.overlay_visible):
+            # 遮罩出现或消失时整个屏幕都会变化
+            dirty.invalidate()
+        self.overlay_visible = overlay
+        
+        # 绘制背景 (含网格)
+        if dirty:
+            dirty.restore(self.screen, self.background)
+        else:
+            self.screen.blit(self.background, (0, 0))
             
         # 绘制游戏对象
-        self.player.draw(self.screen)
+        player_rect = self.player.draw(self.screen, alpha)
         
-        for enemy in self.enemies:
-            enemy.draw(self.screen)
+        enemy_rects = self.enemies.draw(self.screen, alpha)
             
-        for bullet in self.bullets:
-            bullet.draw(self.screen)
+        bullet_rects = self.bullets.draw(self.screen, alpha)
             
-        for powerup in self.powerups:
-            powerup.draw(self.screen)
+        powerup_rects = [powerup.draw(self.screen) for powerup in self.powerups]
             
         # 绘制UI
-        self.draw_ui()
+        ui_rects = self.draw_ui()
         
         if self.game_over:
             self.draw_game_over()
         elif self.paused:
             self.draw_pause()
             
-        pygame.display.flip()
+        # 帧分析覆盖层 (F3)
+        profiler_rect = profiler.draw_overlay(self.screen)
+            
+        if self.headless:
+            return
+        if dirty:
+            dirty.add(player_rect)
+            dirty.add_all(enemy_rects)
+            dirty.add_all(bullet_rects)
+            dirty.add_all(powerup_rects)
+            dirty.add_all(ui_rects)
+            dirty.add(profiler_rect)
+            dirty.present()
+        else:
+            pygame.display.flip()
         
     def draw_ui(self):
         # 分数
-        score_text = self.font.render(f"分数: {self.score}", True, WHITE)
-        self.screen.blit(score_text, (10, 10))
+        score_text = render_text(f"分数: {self.score}", 36, WHITE)
+        drawn = [self.screen.blit(score_text, (10, 10))]
         
         # 波次
-        wave_text = self.font.render(f"波次: {self.wave}", True, WHITE)
-        self.screen.blit(wave_text, (10, 50))
+        wave_text = render_text(f"波次: {self.wave}", 36, WHITE)
+        drawn.append(self.screen.blit(wave_text, (10, 50)))
         
         # 敌人数量
-        enemies_text = self.font.render(f"敌人: {len(self.enemies)}", True, WHITE)
-        self.screen.blit(enemies_text, (10, 90))
+        enemies_text = render_text(f"敌人: {len(self.enemies)}", 36, WHITE)
+        drawn.append(self.screen.blit(enemies_text, (10, 90)))
         
         # 玩家血量
-        health_text = self.font.render(f"血量: {self.player.health}/{self.player.max_health}", 
-                                     True, WHITE)
-        self.screen.blit(health_text, (SCREEN_WIDTH - 200, 10))
+        health_text = render_text(f"血量: {self.player.health}/{self.player.max_health}", 
+                                  36, WHITE)
+        drawn.append(self.screen.blit(health_text, (SCREEN_WIDTH - 200, 10)))
         
         # 操作说明
         controls = [
@@ -441,41 +793,36 @@ class Game:
         ]
         
         for i, control in enumerate(controls):
-            text = pygame.font.Font(None, 20).render(control, True, WHITE)
-            self.screen.blit(text, (SCREEN_WIDTH - 150, 50 + i * 25))
+            text = render_text(control, 20, WHITE)
+            drawn.append(self.screen.blit(text, (SCREEN_WIDTH - 150, 50 + i * 25)))
+        return drawn
             
     def draw_game_over(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.fill(BLACK)
-        overlay.set_alpha(128)
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.overlay, (0, 0))
         
-        game_over_text = self.big_font.render("游戏结束", True, RED)
+        game_over_text = render_text("游戏结束", 72, RED)
         game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
         self.screen.blit(game_over_text, game_over_rect)
         
-        final_score_text = self.font.render(f"最终分数: {self.score}", True, WHITE)
+        final_score_text = render_text(f"最终分数: {self.score}", 36, WHITE)
         score_rect = final_score_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
         self.screen.blit(final_score_text, score_rect)
         
-        restart_text = self.font.render("按 R 重新开始", True, WHITE)
+        restart_text = render_text("按 R 重新开始", 36, WHITE)
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 50))
         self.screen.blit(restart_text, restart_rect)
         
     def draw_pause(self):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        overlay.fill(BLACK)
-        overlay.set_alpha(128)
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.overlay, (0, 0))
         
-        pause_text = self.big_font.render("游戏暂停", True, WHITE)
+        pause_text = render_text("游戏暂停", 72, WHITE)
         pause_rect = pause_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
         self.screen.blit(pause_text, pause_rect)
         
     def reset_game(self):
         self.player = Player(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-        self.enemies = []
-        self.bullets = []
+        self.enemies.clear()
+        self.bullets.clear()
         self.powerups = []
         self.score = 0
         self.wave = 1
@@ -484,33 +831,90 @@ class Game:
         self.paused = False
         self.enemy_spawn_timer = 0
         self.powerup_spawn_timer = 0
-        
-    def run(self):
-        running = True
-        while running:
+        if self.dirty:
+            self.dirty.invalidate()
+        
+    def tick(self, move_x, move_y, aim_x, aim_y, fire, pause=False, restart=False):
+        # 一个逻辑帧: 先处理暂停切换和重新开始, 再推进模拟; 录制和回放都以它为单位
+        if pause:
+            self.paused = not self.paused
+        if restart and self.game_over:
+            self.reset_game()
+        self.update(Action(move_x, move_y, aim_x, aim_y, fire))
+        
+    def state_hash(self):
+        player = self.player
+        enemies = self.enemies
+        bullets = self.bullets
+        n = enemies.count
+        alive = bullets.alive
+        return state_digest(
+            self.ticks, self.score, self.wave, self.enemies_killed, self.game_over, self.paused,
+            (player.x, player.y, player.health, player.speed, player.shoot_delay, player.angle),
+            enemies.x[:n], enemies.y[:n], enemies.health[:n],
+            bullets.x[alive], bullets.y[alive], bullets.owner[alive],
+            [(powerup.x, powerup.y, powerup.type) for powerup in self.powerups])
+        
+    def step(self, ticks=1):
+        # 连续推进若干逻辑帧 (不绘制), 用于无界面模拟
+        for _ in range(ticks):
+            self.update()
+            if self.game_over:
+                break
+        
+    def run(self, recorder=None):
+        # 固定步长循环: 逻辑帧率为 FPS, 渲染帧率与之无关;
+        # recorder 不为 None 时逐个逻辑帧录制输入, 退出时写入最终状态哈希
+        loop = FixedStepLoop(FPS)
+        pause = False
+        restart = False
+        fire = False
+        
+        def handle_events():
+            nonlocal pause, restart, fire
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    running = False
+                    loop.stop()
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
-                        running = False
+                        loop.stop()
                     elif event.key == pygame.K_p:
-                        self.paused = not self.paused
-                    elif event.key == pygame.K_r and self.game_over:
-                        self.reset_game()
+                        pause = not pause
+                    elif event.key == pygame.K_r:
+                        restart = True
+                    elif event.key == pygame.K_F3:
+                        profiler.toggle_overlay()
                 elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1 and not self.game_over and not self.paused:  # 左键
-                        new_bullet = self.player.shoot()
-                        if new_bullet:
-                            self.bullets.append(new_bullet)
-                            
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+                    if event.button == 1:  # 左键
+                        fire = True
+                        
+        def update():
+            # 暂停切换、重新开始和点击开火只作用于事件之后的第一个逻辑帧
+            nonlocal pause, restart, fire
+            action = self.input_source.poll(self.player)
+            values = (action.move_x, action.move_y, int(action.aim_x), int(action.aim_y),
+                      action.fire or fire, pause, restart)
+            pause = restart = fire = False
+            if recorder:
+                recorder.record(*values)
+            self.tick(*values)
+            
+        loop.run(handle_events, update, self.draw)
             
+        if recorder:
+            recorder.close(self.state_hash())
+        profiler.close()
         pygame.quit()
         sys.exit()
 
+def make_replay(log):
+    # 回放用的无界面游戏, 输入全部来自录像
+    return Game(headless=True, seed=log.seed)
+
 if __name__ == "__main__":
-    game = Game()
-    game.run()
\ No newline at end of file
+    # --seed N 固定随机种子, --record 文件 录制本局输入 (用 replay.py 回放)
+    # --profile 文件 导出每帧的分阶段耗时 (.csv 或 JSON lines), F3 显示帧时间直方图
+    seed = session_seed()
+    start_profiling()
+    game = Game(dirty_rects="--dirty-rects" in sys.argv, seed=seed)
+    game.run(open_recorder("shooter", seed, RECORD_FORMAT))
\ No newline at end of file
@@ -0,0 +1,161 @@
+from collections import deque
+
+import numpy as np
+
+from snake_sim import DOWN, LEFT, RIGHT, UP
+
+# 贪吃蛇自动驾驶: 每一步从蛇头出发在当前占用网格上做 BFS 寻找通往食物的最短路,
+# 并检查吃到食物后蛇头还能走到蛇尾 (不会把自己困死); 找不到安全路径时改为追着蛇尾走,
+# 连蛇尾都到不了时选择可活动空间最大的方向。
+# 路径会被缓存, 只有食物移动或路径被挡住时才重新搜索, 所以蛇很长时每帧的开销仍然很小。
+#
+# 坐标单位由 cell_size 决定: import pygame.py 用格子坐标 (cell_size=1),
+# py/snake_game.py 用像素坐标 (cell_size=BLOCK_SIZE), occupied 直接使用游戏自己的占用表。
+# tail_passable 表示蛇头能否进入蛇尾正要离开的格子: import pygame.py 可以,
+# py/snake_game.py 在移走蛇尾之前判断碰撞, 所以不行。
+
+STEPS = ((0, -1), (0, 1), (-1, 0), (1, 0))  # 上、下、左、右
+
+
+class Autopilot:
+    def __init__(self, width, height, cell_size=1, wrap=False, tail_passable=True):
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.wrap = wrap
+        self.tail_passable = tail_passable
+        self.path = deque()
+        self.path_food = None
+
+    def neighbors(self, cell):
+        size = self.cell_size
+        x, y = cell
+        for dx, dy in STEPS:
+            nx = x + dx * size
+            ny = y + dy * size
+            if self.wrap:
+                nx %= self.width * size
+                ny %= self.height * size
+            elif nx < 0 or nx >= self.width * size or ny < 0 or ny >= self.height * size:
+                continue
+            yield (dx, dy), (nx, ny)
+
+    def _bfs(self, start, goal, blocked):
+        # blocked(cell) 为 True 的格子不可通行 (goal 除外), 返回不含起点的路径或 None
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            if cell == goal:
+                path = deque()
+                while cell != start:
+                    path.appendleft(cell)
+                    cell = parents[cell]
+                return path
+            for _, nxt in self.neighbors(cell):
+                if nxt not in parents and (nxt == goal or not blocked(nxt)):
+                    parents[nxt] = cell
+                    queue.append(nxt)
+        return None
+
+    def _space(self, start, blocked, limit):
+        # 从 start 出发能到达的格子数, 最多数到 limit
+        seen = {start}
+        queue = deque([start])
+        while queue and len(seen) < limit:
+            for _, nxt in self.neighbors(queue.popleft()):
+                if nxt not in seen and not blocked(nxt):
+                    seen.add(nxt)
+                    queue.append(nxt)
+        return len(seen)
+
+    def _safe(self, body, path, growing):
+        # 模拟沿 path 吃到食物后的蛇身, 检查蛇头能否再走到蛇尾
+        length = len(body) + (1 if growing else 0)
+        virtual = list(reversed(path))
+        for cell in body:
+            if len(virtual) >= length:
+                break
+            virtual.append(cell)
+        if len(virtual) < 2:
+            return True
+        occupied = set(virtual)
+        tail = virtual[-1]
+        return self._bfs(virtual[0], tail, occupied.__contains__) is not None
+
+    def invalidate(self):
+        self.path.clear()
+        self.path_food = None
+
+    def choose(self, body, occupied, food, growing=False):
+        # body 为从蛇头到蛇尾的序列, occupied 支持 in 判断; 返回 (dx, dy) 或 None
+        head = body[0]
+        tail = body[-1]
+        neck = body[1] if len(body) > 1 else None
+        tail_free = self.tail_passable and not growing
+
+        def blocked(cell):
+            # 不能掉头; 蛇尾下一步会移开时可以通行
+            if cell == neck:
+                return True
+            return cell in occupied and (cell != tail or not tail_free)
+
+        # 缓存的路径仍然有效时直接沿用
+        path = self.path
+        if path and food == self.path_food and not blocked(path[0]):
+            for step, cell in self.neighbors(head):
+                if cell == path[0]:
+                    path.popleft()
+                    return step
+        self.invalidate()
+
+        if food is not None:
+            found = self._bfs(head, food, blocked)
+            if found and self._safe(body, found, growing):
+                self.path = found
+                self.path_food = food
+                return self.choose(body, occupied, food, growing)
+
+        # 找不到安全的食物路径: 追着蛇尾走
+        if len(body) > 1:
+            to_tail = self._bfs(head, tail, blocked)
+            if to_tail and (len(to_tail) > 1 or tail_free):
+                for step, cell in self.neighbors(head):
+                    if cell == to_tail[0]:
+                        return step
+
+        # 最后的选择: 可活动空间最大的方向
+        best = None
+        best_space = -1
+        limit = len(body) + 1
+        for step, cell in self.neighbors(head):
+            if blocked(cell):
+                continue
+            space = self._space(cell, blocked, limit)
+            if space > best_space:
+                best = step
+                best_space = space
+        return best
+
+
+# 在 snake_sim.SnakeSim 上驱动自动驾驶: 每局一个 Autopilot, 蛇身顺序由存活步数还原
+class SimAutopilot:
+    def __init__(self, sim):
+        self.sim = sim
+        self.pilots = [Autopilot(sim.width, sim.height, wrap=sim.wrap, tail_passable=not sim.wrap)
+                       for _ in range(sim.num_envs)]
+        self.actions = {(0, -1): UP, (0, 1): DOWN, (-1, 0): LEFT, (1, 0): RIGHT}
+
+    def act(self):
+        sim = self.sim
+        actions = sim.direction.copy()
+        for env, pilot in enumerate(self.pilots):
+            grid = sim.grid[env]
+            ys, xs = np.nonzero(grid)
+            order = np.argsort(-grid[ys, xs])
+            body = list(zip(xs[order].tolist(), ys[order].tolist()))
+            step = pilot.choose(body, set(body), (int(sim.food_x[env]), int(sim.food_y[env])),
+                                bool(sim.grow[env]))
+            if step is not None:
+                actions[env] = self.actions[step]
+        return actions
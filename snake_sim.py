@@ -0,0 +1,129 @@
+import numpy as np
+
+# 无界面的批量贪吃蛇模拟器 (不依赖 pygame): N 局游戏共用一个 (N, H, W) 的网格数组,
+# 每个格子保存蛇身剩余的存活步数 (蛇头为蛇长, 蛇尾为 1, 空格为 0),
+# 蛇前进一步时所有蛇身格子减 1 即完成移动, 吃到食物的下一步不减即完成增长。
+#
+# 两套规则:
+#   "walls" —— import pygame.py: 撞墙或撞到自己死亡, 每个食物 1 分
+#   "wrap"  —— py/snake_game.py: 穿墙, 撞到前三节以外的蛇身死亡, 每个食物 10 分
+# 与游戏一致, 反方向的动作被忽略。结束的对局 (死亡或占满棋盘) 会自动重开。
+
+GRID_WIDTH = 40
+GRID_HEIGHT = 30
+
+# 动作编号与方向
+UP, DOWN, LEFT, RIGHT = 0, 1, 2, 3
+DIRECTION_DX = np.array([0, 0, -1, 1])
+DIRECTION_DY = np.array([-1, 1, 0, 0])
+OPPOSITE = np.array([DOWN, UP, RIGHT, LEFT])
+
+RULES = {
+    "walls": {"wrap": False, "score_per_food": 1},
+    "wrap": {"wrap": True, "score_per_food": 10},
+}
+
+
+class SnakeSim:
+    def __init__(self, num_envs, rules="walls", width=GRID_WIDTH, height=GRID_HEIGHT, seed=None):
+        self.num_envs = num_envs
+        self.rules = rules
+        self.wrap = RULES[rules]["wrap"]
+        self.score_per_food = RULES[rules]["score_per_food"]
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.env_index = np.arange(num_envs)
+        self.grid = np.zeros((num_envs, height, width), dtype=np.int32)
+        self.head_x = np.zeros(num_envs, dtype=np.int64)
+        self.head_y = np.zeros(num_envs, dtype=np.int64)
+        self.direction = np.zeros(num_envs, dtype=np.int64)
+        self.length = np.zeros(num_envs, dtype=np.int32)
+        self.grow = np.zeros(num_envs, dtype=bool)
+        self.scores = np.zeros(num_envs, dtype=np.int64)
+        self.food_x = np.zeros(num_envs, dtype=np.int64)
+        self.food_y = np.zeros(num_envs, dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        # mask 为 None 时重置全部对局, 否则只重置 mask 为 True 的对局
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        envs = np.flatnonzero(mask)
+        self.grid[envs] = 0
+        self.head_x[envs] = self.width // 2
+        self.head_y[envs] = self.height // 2
+        self.grid[envs, self.height // 2, self.width // 2] = 1
+        self.length[envs] = 1
+        self.grow[envs] = False
+        self.scores[envs] = 0
+        if self.wrap:
+            self.direction[envs] = self.rng.integers(0, 4, len(envs))
+        else:
+            self.direction[envs] = RIGHT
+        self._place_food(envs)
+
+    def _place_food(self, envs):
+        # 为指定对局在空格中均匀随机放置食物, 返回没有空格 (占满棋盘) 的对局掩码
+        if len(envs) == 0:
+            return np.zeros(0, dtype=bool)
+        keys = self.rng.random((len(envs), self.height * self.width))
+        keys[self.grid[envs].reshape(len(envs), -1) > 0] = -1.0
+        cells = keys.argmax(axis=1)
+        self.food_y[envs] = cells // self.width
+        self.food_x[envs] = cells % self.width
+        return keys[np.arange(len(envs)), cells] < 0
+
+    def observe(self):
+        return {
+            "body": self.grid > 0,
+            "head": np.stack([self.head_x, self.head_y], axis=1),
+            "food": np.stack([self.food_x, self.food_y], axis=1),
+            "direction": self.direction.copy(),
+        }
+
+    def step(self, actions):
+        # 返回 (rewards, dones, info); info["final_score"] 为本步结束的对局的最终分数
+        actions = np.asarray(actions)
+        envs = self.env_index
+        grid = self.grid
+        self.direction = np.where(actions == OPPOSITE[self.direction], self.direction, actions)
+        new_x = self.head_x + DIRECTION_DX[self.direction]
+        new_y = self.head_y + DIRECTION_DY[self.direction]
+        shrink = ~self.grow
+
+        if self.wrap:
+            new_x %= self.width
+            new_y %= self.height
+            # 移动前检查: 前三节 (存活步数 > 蛇长 - 3) 以外的蛇身都算碰撞, 包括即将移走的蛇尾
+            cell = grid[envs, new_y, new_x]
+            dead = (cell > 0) & (cell <= self.length - 3)
+            np.subtract(grid, 1, out=grid, where=(grid > 0) & shrink[:, None, None])
+        else:
+            outside = (new_x < 0) | (new_x >= self.width) | (new_y < 0) | (new_y >= self.height)
+            # 先移走蛇尾, 蛇头可以进入蛇尾刚离开的格子
+            np.subtract(grid, 1, out=grid, where=(grid > 0) & shrink[:, None, None])
+            cell = grid[envs, np.clip(new_y, 0, self.height - 1), np.clip(new_x, 0, self.width - 1)]
+            dead = outside | (cell > 0)
+
+        alive = ~dead
+        live = envs[alive]
+        self.length[live] += self.grow[live]
+        self.head_x[live] = new_x[alive]
+        self.head_y[live] = new_y[alive]
+        grid[live, self.head_y[live], self.head_x[live]] = self.length[live]
+
+        # 吃到食物: 下一步增长, 重新放置食物
+        ate = alive & (self.head_x == self.food_x) & (self.head_y == self.food_y)
+        self.grow = ate
+        rewards = np.where(ate, self.score_per_food, 0)
+        self.scores += rewards
+        won = np.zeros(self.num_envs, dtype=bool)
+        eaters = np.flatnonzero(ate)
+        won[eaters] = self._place_food(eaters)
+
+        dones = dead | won
+        final_scores = np.where(dones, self.scores, 0)
+        if dones.any():
+            self.reset(dones)
+        return rewards, dones, {"final_score": final_scores, "dead": dead, "won": won}
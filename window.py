@@ -0,0 +1,12 @@
+import pygame
+
+# 按需初始化 pygame: 游戏只用到显示和字体两个子系统, 不调用 pygame.init() (音频、手柄等都不初始化)。
+# 导入游戏模块没有任何副作用, 窗口在 main() 或创建 Game 时才由 open_window 打开,
+# 字体子系统在 render_cache.get_font 第一次创建字体时初始化。
+
+
+def open_window(size, caption):
+    pygame.display.init()
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption(caption)
+    return screen